@@ -1,19 +1,285 @@
 import pygame
 import cv2
-import mediapipe as mp
 import random
 import sys
 import os
 import threading
 import time
 import math
+import json
+import bisect
+import gc
+import tracemalloc
+import queue
+import sqlite3
+import numpy as np
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    from pygame._sdl2.video import Window, Renderer, Texture
+    sdl2_video_available = True
+except ImportError:
+    sdl2_video_available = False
+
+# ------------------ Settings ------------------
+# Every setting can be overridden with an ASCENDIO_<NAME> environment variable
+def env_flag(value):
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def setting(name, default, cast=str):
+    value = os.environ.get(f"ASCENDIO_{name}")
+    if value is None:
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        print(f"🔮 Ignoring invalid ASCENDIO_{name}={value!r}")
+        return default
+
+# Presentation: "sdl2" (GPU renderer + texture), "scaled" (pygame.SCALED) or "software"
+RENDERER = setting("RENDERER", "sdl2")
+WINDOW_SCALE = setting("WINDOW_SCALE", 1.0, float)
+FULLSCREEN = setting("FULLSCREEN", False, env_flag)
+SCALE_QUALITY = setting("SCALE_QUALITY", "linear")  # nearest | linear | best
+BENCHMARK_FRAMES = setting("BENCHMARK_FRAMES", 0, int)
+BENCHMARK_SCENE = setting("BENCHMARK_SCENE", "")  # start in this scene, e.g. to benchmark it alone
+# Frame pacing: vsync lets the buffer swap pace frames; otherwise "sleep" (clock.tick),
+# "busy" (clock.tick_busy_loop) or "hybrid" (sleep, then spin the last SPIN_MS)
+VSYNC = setting("VSYNC", False, env_flag)
+PACING = setting("PACING", "hybrid")  # sleep | busy | hybrid
+SPIN_MS = setting("SPIN_MS", 2.0, float)
+PLAYERS = max(1, min(2, setting("PLAYERS", 1, int)))  # 2 = local co-op, one tracked hand each
+# Gesture detection: backend name, camera index or video clip path, optional gesture log
+DETECTOR = setting("DETECTOR", "mediapipe")  # mediapipe | contour | replay
+CAMERA = setting("CAMERA", "0")
+GESTURE_LOG = setting("GESTURE_LOG", "")  # record detections as JSON lines
+GESTURE_REPLAY = setting("GESTURE_REPLAY", "")  # gesture log played back by the replay backend
+BENCHMARK_DETECTORS = setting("BENCHMARK_DETECTORS", "")  # clip to benchmark every backend on
+BENCHMARK_LABELS = setting("BENCHMARK_LABELS", "")  # gesture log with the clip's true open/closed frames
+STAR_COUNT = setting("STAR_COUNT", 100, int)
+# Power: menus redraw at MENU_FPS (or on input), the detector only grabs frames
+# at IDLE_DETECTOR_FPS outside gameplay, and the game pauses without window focus
+MENU_FPS = max(1, setting("MENU_FPS", 30, int))
+IDLE_DETECTOR_FPS = max(1, setting("IDLE_DETECTOR_FPS", 5, int))
+PAUSE_ON_FOCUS_LOSS = setting("PAUSE_ON_FOCUS_LOSS", True, env_flag)
+# Input latency: hand-to-jump histogram overlay (toggle with L), dump file and metrics port
+LATENCY_OVERLAY = setting("LATENCY_OVERLAY", False, env_flag)
+LATENCY_DUMP = setting("LATENCY_DUMP", "")  # .json or .csv, written on exit
+METRICS_PORT = setting("METRICS_PORT", 0, int)  # serves Prometheus text on 127.0.0.1
+# Leaderboard and per-run statistics; an empty path turns persistence off
+STATS_DB = setting("STATS_DB", "ascendio.db")
+LEADERBOARD_SIZE = setting("LEADERBOARD_SIZE", 5, int)
+# Memory: tracemalloc/GC-pause profiling every N frames, and the cyclic GC policy
+MEMORY_PROFILE = setting("MEMORY_PROFILE", 0, int)
+GC_MODE = setting("GC_MODE", "default")  # default | tuned | levels
+GC_THRESHOLD = setting("GC_THRESHOLD", 10000, int)  # generation-0 threshold in tuned mode
 
 # ------------------ Pygame Setup ------------------
 pygame.init()
+# Logical resolution: all game drawing happens in these coordinates
 WIDTH, HEIGHT = 800, 600
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("⚡ Hogwarts: The Forbidden Run ⚡")
+CAPTION = "⚡ Hogwarts: The Forbidden Run ⚡"
+
+def fit_rect(logical_size, output_size):
+    # Largest aspect-preserving rect of logical_size centered in output_size
+    scale = min(output_size[0] / logical_size[0], output_size[1] / logical_size[1])
+    w, h = int(logical_size[0] * scale), int(logical_size[1] * scale)
+    return pygame.Rect((output_size[0] - w) // 2, (output_size[1] - h) // 2, w, h)
+
+class Display:
+    # Owns the logical canvas the game draws on and presents it to the window.
+    # The sdl2 and scaled paths let SDL do scaling on the GPU; software scales in Python.
+    def __init__(self, logical_size, mode="sdl2", window_scale=1.0, fullscreen=False, vsync=False):
+        self.logical_size = logical_size
+        self.vsync = vsync
+        if mode == "sdl2" and not sdl2_video_available:
+            mode = "scaled"
+        self.mode = mode
+        os.environ.setdefault("SDL_RENDER_SCALE_QUALITY", SCALE_QUALITY)
+        window_size = (int(logical_size[0] * window_scale), int(logical_size[1] * window_scale))
+
+        if mode == "sdl2":
+            self.window = Window(CAPTION, size=window_size, fullscreen_desktop=fullscreen)
+            self.renderer = Renderer(self.window, vsync=vsync)
+            self.renderer.logical_size = logical_size
+            self.texture = Texture(self.renderer, logical_size, streaming=True)
+            self.canvas = pygame.Surface(logical_size)
+        elif mode == "scaled":
+            flags = pygame.SCALED | (pygame.FULLSCREEN if fullscreen else 0)
+            try:
+                self.canvas = pygame.display.set_mode(logical_size, flags, vsync=int(vsync))
+            except pygame.error:
+                # No vsync-capable renderer; fall back to a free-running swap
+                self.vsync = False
+                self.canvas = pygame.display.set_mode(logical_size, flags)
+            pygame.display.set_caption(CAPTION)
+        else:
+            # The software path blits to a plain window surface, which SDL cannot vsync
+            self.vsync = False
+            if fullscreen:
+                self.window_surface = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+            else:
+                self.window_surface = pygame.display.set_mode(window_size)
+            pygame.display.set_caption(CAPTION)
+            if self.window_surface.get_size() == logical_size:
+                self.canvas = self.window_surface
+            else:
+                self.canvas = pygame.Surface(logical_size)
+                # Frames are scaled straight into the letterbox area; the bars stay black
+                self.window_surface.fill((0, 0, 0))
+                self.view_surface = self.window_surface.subsurface(
+                    fit_rect(logical_size, self.window_surface.get_size()))
+
+    def output_size(self):
+        if self.mode == "sdl2":
+            return self.window.size
+        if self.mode == "scaled":
+            return self.logical_size
+        return self.window_surface.get_size()
+
+    def mouse_pos(self):
+        # Map window coordinates back to logical coordinates
+        x, y = pygame.mouse.get_pos()
+        if self.mode == "scaled" or self.output_size() == self.logical_size:
+            return x, y
+        view = fit_rect(self.logical_size, self.output_size())
+        return ((x - view.x) * self.logical_size[0] // max(1, view.width),
+                (y - view.y) * self.logical_size[1] // max(1, view.height))
+
+    def present(self):
+        if self.mode == "sdl2":
+            self.texture.update(self.canvas)
+            self.renderer.draw_color = (0, 0, 0, 255)
+            self.renderer.clear()
+            self.texture.draw()
+            self.renderer.present()
+            return
+        if self.mode == "software" and self.canvas is not self.window_surface:
+            pygame.transform.scale(self.canvas, self.view_surface.get_size(), self.view_surface)
+        pygame.display.flip()
+
+class FrameStats:
+    # Rolling window of frame work times in milliseconds
+    def __init__(self, window=240):
+        self.frame_times = deque(maxlen=window)
+        self.frames = 0
+        self.total = 0.0  # sum of every sample, including those out of the window
+
+    def add(self, frame_ms):
+        self.frame_times.append(frame_ms)
+        self.frames += 1
+        self.total += frame_ms
+
+    def mark(self):
+        return self.frames, self.total
+
+    def mean_since(self, mark):
+        # Mean of the samples added after mark(); None if there were none
+        frames, total = mark
+        return (self.total - total) / (self.frames - frames) if self.frames > frames else None
+
+    def mean(self):
+        return sum(self.frame_times) / len(self.frame_times) if self.frame_times else 0.0
+
+    def percentile(self, pct):
+        if not self.frame_times:
+            return 0.0
+        ordered = sorted(self.frame_times)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def stdev(self):
+        if len(self.frame_times) < 2:
+            return 0.0
+        mean = self.mean()
+        return math.sqrt(sum((t - mean) ** 2 for t in self.frame_times) / (len(self.frame_times) - 1))
+
+    def summary(self):
+        return (f"{len(self.frame_times)} frames: mean {self.mean():.2f} ms, "
+                f"p95 {self.percentile(95):.2f} ms, max {max(self.frame_times, default=0):.2f} ms")
+
+class FramePacer:
+    # Holds presents to a fixed period. Timer pacing waits between drawing and
+    # present so the swap lands on the deadline whatever the frame cost; hybrid
+    # sleeps to just short of an absolute deadline and spins the rest, so sleep
+    # overshoot does not become jitter. With vsync the swap itself blocks.
+    # Hybrid also sleeps off the slack before input is polled (before_frame),
+    # leaving only the usual frame cost, so jumps are not held back a frame.
+    def __init__(self, clock, fps, mode="hybrid", vsync=False, spin_ms=2.0, window=240):
+        self.clock = clock
+        self.fps = fps
+        self.period = 1.0 / fps
+        self.mode = "vsync" if vsync else mode
+        self.spin = spin_ms / 1000
+        self.deadline = time.perf_counter() + self.period
+        self.last_present = None
+        self.intervals = FrameStats(window)  # present-to-present time in ms
+        self.missed = 0
+
+    def before_frame(self, work_ms):
+        # Start the frame as late as its recent cost allows; before_present spins
+        # out whatever is left, so a frame that runs long still makes the deadline
+        if self.mode != "hybrid":
+            return
+        wake = self.deadline - work_ms / 1000 - self.spin
+        now = time.perf_counter()
+        if now < wake < now + self.period:
+            time.sleep(wake - now)
+
+    def before_present(self):
+        if self.mode != "vsync":
+            self.wait()
+
+    def presented(self, record=True):
+        # Call right after display.present(). Menus and pauses wait on input,
+        # so their gaps are not recorded as missed frames.
+        now = time.perf_counter()
+        if record and self.last_present is not None:
+            interval_ms = (now - self.last_present) * 1000
+            self.intervals.add(interval_ms)
+            if interval_ms > 1500 * self.period:
+                self.missed += 1
+        self.last_present = now if record else None
+        if self.mode != "vsync":
+            return
+        if now > self.deadline - 0.1 * self.period:
+            # The swap is pacing frames; follow it rather than a schedule that
+            # drifts from the display clock
+            self.deadline = now + self.period
+            self.clock.tick()
+        else:
+            # Swaps come faster than fps (vsync ignored or a high-refresh display)
+            self.wait()
+
+    def reset(self):
+        self.last_present = None
+
+    def wait(self):
+        if self.mode == "sleep":
+            self.clock.tick(self.fps)
+            return
+        if self.mode == "busy":
+            self.clock.tick_busy_loop(self.fps)
+            return
+        now = time.perf_counter()
+        if now > self.deadline + self.period:
+            # Fell more than a frame behind: restart the schedule instead of bursting
+            self.deadline = now
+        if self.deadline - now > self.spin:
+            time.sleep(self.deadline - now - self.spin)
+        while time.perf_counter() < self.deadline:
+            time.sleep(0)  # yields the GIL to the detector thread while spinning
+        self.deadline += self.period
+        self.clock.tick()
+
+    def summary(self):
+        return (f"interval mean {self.intervals.mean():.2f} ms, stdev {self.intervals.stdev():.2f} ms, "
+                f"p99 {self.intervals.percentile(99):.2f} ms, missed {self.missed}/{self.intervals.frames}")
+
+display = Display((WIDTH, HEIGHT), RENDERER, WINDOW_SCALE, FULLSCREEN, VSYNC)
+screen = display.canvas
 clock = pygame.time.Clock()
+frame_stats = FrameStats(BENCHMARK_FRAMES if BENCHMARK_FRAMES > 0 else 240)
 
 # Magical Color Palette
 MIDNIGHT_BLUE = (15, 23, 42)
@@ -47,6 +313,154 @@ except:
     font_small = pygame.font.Font(None, 24)
     font_tiny = pygame.font.Font(None, 18)
 
+# ------------------ Quality Governor ------------------
+# Tiers from most to least expensive. spawn_chance thins every particle spawn,
+# star_fraction scales STAR_COUNT, rotation_steps is the number of pre-rotated
+# frames per obstacle image.
+QUALITY_TIERS = [
+    {"name": "ultra", "particle_cap": 400, "spawn_chance": 1.0, "glow": True, "fog": True, "star_fraction": 1.0, "rotation_steps": 360, "detector_fps": 30},
+    {"name": "high", "particle_cap": 250, "spawn_chance": 0.8, "glow": True, "fog": True, "star_fraction": 1.0, "rotation_steps": 120, "detector_fps": 30},
+    {"name": "medium", "particle_cap": 150, "spawn_chance": 0.5, "glow": True, "fog": False, "star_fraction": 0.6, "rotation_steps": 60, "detector_fps": 20},
+    {"name": "low", "particle_cap": 60, "spawn_chance": 0.25, "glow": False, "fog": False, "star_fraction": 0.3, "rotation_steps": 24, "detector_fps": 12}
+]
+QUALITY = setting("QUALITY", "auto")  # auto or a fixed tier name
+TARGET_FPS = 60
+
+class QualityGovernor:
+    # Steps through QUALITY_TIERS based on rolling frame work time.
+    # Downgrades when the window average exceeds the budget, upgrades only when it
+    # is comfortably below it, and waits a cooldown after each change (hysteresis).
+    def __init__(self, budget_ms, mode="auto", window=60, cooldown=120):
+        names = [tier["name"] for tier in QUALITY_TIERS]
+        if mode != "auto" and mode not in names:
+            print(f"🔮 Unknown quality {mode!r}; qualities: auto, {', '.join(names)}")
+            mode = "auto"
+        self.budget_ms = budget_ms
+        self.auto = mode == "auto"
+        self.stats = FrameStats(window)
+        self.cooldown = cooldown
+        self.frames_since_change = 0
+        self.tier_index = 0
+        for i, tier in enumerate(QUALITY_TIERS):
+            if tier["name"] == mode:
+                self.tier_index = i
+        self.tier = QUALITY_TIERS[self.tier_index]
+
+    def set_tier(self, index):
+        self.tier_index = index
+        self.tier = QUALITY_TIERS[index]
+        self.stats.frame_times.clear()
+        self.frames_since_change = 0
+        print(f"🔮 Quality tier: {self.tier['name']}")
+
+    def record(self, frame_ms):
+        if not self.auto:
+            return
+        self.stats.add(frame_ms)
+        self.frames_since_change += 1
+        if self.frames_since_change < self.cooldown or len(self.stats.frame_times) < self.stats.frame_times.maxlen:
+            return
+        average = self.stats.mean()
+        if average > self.budget_ms * 0.9 and self.tier_index < len(QUALITY_TIERS) - 1:
+            self.set_tier(self.tier_index + 1)
+        elif average < self.budget_ms * 0.5 and self.tier_index > 0:
+            self.set_tier(self.tier_index - 1)
+
+quality = QualityGovernor(1000 / TARGET_FPS, QUALITY)
+
+# ------------------ Memory ------------------
+# Hard caps on everything that grows while the game runs. Lists are checked on
+# insert; caches are bounded by their key space and cleared if they exceed it.
+#   particles               PARTICLE_LIMIT, below that the tier's particle_cap (60-400)
+#   Game.obstacles          OBSTACLE_LIMIT; off-screen ones are removed, ~4 are alive
+#   Game.letters            LETTER_LIMIT
+#   particle_sprites        PARTICLE_SPRITE_LIMIT (colors x sizes x life steps)
+#   letter_glyphs           one per character in LEVELS phrases
+#   rotation_atlases/masks  obstacle images x rotation steps (<= 360 each)
+#   Scene.layers            per scene key space, freed on scene exit
+#   FrameStats windows, LatencyTracker.records, GestureState: fixed-size deques
+#   RunStore.pending        drained by the writer within a second while it runs;
+#                           record() stops queuing if the writer failed to start
+# Surfaces drawn every frame come from these caches or were built once (glows,
+# HUD layer, software letterbox subsurface). The only per-frame surfaces left in
+# gameplay are the opt-in latency overlay's two text lines.
+PARTICLE_LIMIT = 400
+OBSTACLE_LIMIT = 12
+LETTER_LIMIT = 12
+PARTICLE_SPRITE_LIMIT = 2048
+
+class MemoryProbe:
+    # ASCENDIO_MEMORY_PROFILE=N: GC pause time per frame, and a tracemalloc
+    # snapshot every N frames listing the lines whose allocations grew most.
+    # Snapshots take a while, so expect a hitch each time one is taken.
+    def __init__(self, snapshot_every):
+        self.snapshot_every = snapshot_every
+        self.frames = 0
+        self.gc_started = None
+        self.last_snapshot = None
+        self.reset()
+        tracemalloc.start()
+        gc.callbacks.append(self.on_gc)
+
+    def reset(self):
+        # Called before the main loop so import-time and startup collections are not
+        # charged to the first frame
+        self.frame_gc_ms = 0.0
+        self.gc_pauses = FrameStats(10000)  # ms per collection
+        self.gameplay_gc = FrameStats(10000)  # ms of collection per gameplay frame
+        self.collections = [0, 0, 0]  # by generation
+
+    def on_gc(self, phase, info):
+        # Runs on whichever thread triggered the collection
+        if phase == "start":
+            self.gc_started = time.perf_counter()
+        elif self.gc_started is not None:
+            pause_ms = (time.perf_counter() - self.gc_started) * 1000
+            self.gc_pauses.add(pause_ms)
+            self.frame_gc_ms += pause_ms
+            self.collections[info["generation"]] += 1
+            self.gc_started = None
+
+    def end_frame(self, sizes, gameplay):
+        # Collections in menu frames (like the one GC_MODE=levels runs after a level)
+        # count in the totals but not in the gameplay frame figures
+        if gameplay:
+            self.gameplay_gc.add(self.frame_gc_ms)
+        self.frame_gc_ms = 0.0
+        self.frames += 1
+        if self.frames % self.snapshot_every == 0:
+            self.snapshot(sizes)
+
+    def snapshot(self, sizes):
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)])
+        current, peak = tracemalloc.get_traced_memory()
+        print(f"🧠 frame {self.frames}: traced {current / 1e6:.1f} MB (peak {peak / 1e6:.1f} MB), "
+              + ", ".join(f"{name} {size}" for name, size in sizes.items()))
+        if self.last_snapshot is not None:
+            for stat in snapshot.compare_to(self.last_snapshot, "lineno")[:5]:
+                print(f"🧠   {stat}")
+        self.last_snapshot = snapshot
+
+    def summary(self):
+        return (f"GC {sum(self.collections)} collections (gen0/1/2 {self.collections}), "
+                f"pause max {max(self.gc_pauses.frame_times, default=0):.2f} ms; "
+                f"GC per gameplay frame p99 {self.gameplay_gc.percentile(99):.3f} ms, "
+                f"max {max(self.gameplay_gc.frame_times, default=0):.2f} ms")
+
+memory_probe = MemoryProbe(MEMORY_PROFILE) if MEMORY_PROFILE > 0 else None
+
+def gameplay_started():
+    # GC_MODE=levels: no cyclic collections during a level. Per-frame garbage is
+    # acyclic and freed by reference counting; cycles wait for the level to end.
+    if GC_MODE == "levels":
+        gc.disable()
+
+def gameplay_ended():
+    if GC_MODE == "levels":
+        gc.enable()
+        gc.collect()
+
 # Particle system for magical effects
 class MagicParticle:
     def __init__(self, x, y, color, vel_x=None, vel_y=None):
@@ -67,22 +481,26 @@ class MagicParticle:
         
     def draw(self, screen):
         if self.life > 0:
-            alpha = int((self.life / 30) * 255)
-            s = pygame.Surface((int(self.size * 2), int(self.size * 2)), pygame.SRCALPHA)
-            pygame.draw.circle(s, (*self.color, alpha), (int(self.size), int(self.size)), int(self.size))
+            s = particle_sprite(self.color, int(self.size * 2), self.life)
             screen.blit(s, (int(self.x - self.size), int(self.y - self.size)))
 
-# ------------------ MediaPipe Hand Setup ------------------
-mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(
-    min_detection_confidence=0.7,
-    min_tracking_confidence=0.5,
-    max_num_hands=1
-)
+# Particle sprites by (color, diameter, life); a particle's look depends only on these
+particle_sprites = {}
+
+def particle_sprite(color, diameter, life):
+    key = (color, diameter, life)
+    sprite = particle_sprites.get(key)
+    if sprite is None:
+        if len(particle_sprites) >= PARTICLE_SPRITE_LIMIT:
+            particle_sprites.clear()
+        alpha = int((life / 30) * 255)
+        sprite = particle_sprites[key] = pygame.Surface((diameter, diameter), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, (*color, alpha), (diameter // 2, diameter // 2), diameter // 2)
+    return sprite
 
 # ------------------ Webcam Setup ------------------
 try:
-    cap = cv2.VideoCapture(0)
+    cap = cv2.VideoCapture(int(CAMERA) if CAMERA.isdigit() else CAMERA)
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, 320)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 240)
     cap.set(cv2.CAP_PROP_FPS, 30)
@@ -91,15 +509,266 @@ except:
     webcam_available = False
     print("🔮 Webcam not available - using wand movements (keyboard) only")
 
+DETECTOR_SIZE = (160, 120)
+
+class FramePipeline:
+    # Capture -> downscale -> RGB using buffers allocated once. The frame is not
+    # mirrored: landmarks come back in camera space, so screen-space x is 1 - x.
+    def __init__(self, size=DETECTOR_SIZE):
+        self.size = size
+        self.frame = None
+        self.small = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        self.rgb = np.empty_like(self.small)
+        # Backends get a read-only view, which also lets MediaPipe skip its own copy
+        self.rgb_view = self.rgb.view()
+        self.rgb_view.flags.writeable = False
+
+    def read(self, cap):
+        # cap.read decodes into self.frame once its shape is known
+        ret, frame = cap.read(self.frame) if self.frame is not None else cap.read()
+        if not ret:
+            return None
+        self.frame = frame
+        cv2.resize(frame, self.size, dst=self.small)
+        cv2.cvtColor(self.small, cv2.COLOR_BGR2RGB, dst=self.rgb)
+        return self.rgb_view
+
+frame_pipeline = FramePipeline()
+detector_stats = FrameStats()  # detector thread CPU time per inference, in ms
+
 # ------------------ Thread-Safe Jump Control ------------------
 jump_lock = threading.Lock()
-jump_triggered = False
+jump_triggered = [False] * PLAYERS  # one flag per player
 hand_control_enabled = True
+detector_idle = False  # set by the main loop when nobody is playing
 running = True
 
+# ------------------ Input Latency ------------------
+# Each hand-triggered jump carries perf_counter stamps from the detector thread
+# to the main loop. Stages are the gaps between consecutive stamps.
+LATENCY_STAMPS = ("capture", "inference", "enqueued", "consumed", "flipped")
+LATENCY_STAGES = ("inference", "enqueued", "consumed", "flipped", "total")
+LATENCY_BINS = 20  # overlay histogram buckets
+LATENCY_BIN_MS = 10
+
+class LatencyTracker:
+    def __init__(self, players, window=240, history=10000):
+        self.pending = [None] * players  # queued trace per player, guarded by jump_lock
+        self.awaiting_flip = []
+        self.stages = {stage: FrameStats(window) for stage in LATENCY_STAGES}
+        self.records = deque(maxlen=history)
+        self.dropped = 0  # triggers that found the wizard already airborne
+        self.lock = threading.Lock()  # stats are read by the metrics server thread
+
+    def enqueue(self, player_idx, captured, inferred):
+        # Detector thread, called with jump_lock held
+        self.pending[player_idx] = [captured, inferred, time.perf_counter()]
+
+    def consume(self, player_idx, jumped):
+        # Main loop, called with jump_lock held
+        trace, self.pending[player_idx] = self.pending[player_idx], None
+        if trace is None:
+            return
+        if jumped:
+            trace.append(time.perf_counter())
+            self.awaiting_flip.append((player_idx, trace))
+        else:
+            self.dropped += 1
+
+    def flipped(self):
+        # Main loop, right after the frame showing the jump has been presented
+        if not self.awaiting_flip:
+            return
+        now = time.perf_counter()
+        with self.lock:
+            for player_idx, trace in self.awaiting_flip:
+                trace.append(now)
+                gaps = [(b - a) * 1000 for a, b in zip(trace, trace[1:])]
+                gaps.append((now - trace[0]) * 1000)
+                for stage, gap_ms in zip(LATENCY_STAGES, gaps):
+                    self.stages[stage].add(gap_ms)
+                self.records.append([player_idx] + trace)
+        self.awaiting_flip.clear()
+
+    def histogram(self):
+        counts = [0] * LATENCY_BINS
+        for total_ms in self.stages["total"].frame_times:
+            counts[min(LATENCY_BINS - 1, int(total_ms // LATENCY_BIN_MS))] += 1
+        return counts
+
+    def draw(self, surface, x=10, y=440, w=200, h=80):
+        # Rolling hand-to-photon histogram; the last bucket also holds anything slower
+        panel = pygame.Rect(x, y, w, h + 40)
+        surface.fill(SHADOW_BLACK, panel)
+        counts = self.histogram()
+        peak = max(counts) or 1
+        bar_w = w // LATENCY_BINS
+        for i, count in enumerate(counts):
+            bar_h = h * count // peak
+            surface.fill(SPELL_BLUE, (x + i * bar_w, y + h - bar_h, bar_w - 1, bar_h))
+        total = self.stages["total"]
+        lines = [f"hand->jump p50 {total.percentile(50):.0f} p95 {total.percentile(95):.0f} ms",
+                 f"infer {self.stages['inference'].mean():.1f}  queue {self.stages['consumed'].mean():.1f}  "
+                 f"draw {self.stages['flipped'].mean():.1f} ms"]
+        for i, line in enumerate(lines):
+            surface.blit(font_tiny.render(line, True, SILVERY_WHITE), (x + 4, y + h + 4 + i * 16))
+
+    def dump(self, path):
+        columns = ("player",) + tuple(f"{stamp}_s" for stamp in LATENCY_STAMPS)
+        with open(path, "w") as dump_file:
+            if path.endswith(".json"):
+                json.dump({"records": [dict(zip(columns, record)) for record in self.records],
+                           "dropped": self.dropped,
+                           "summary": {stage: {"mean_ms": stats.mean(), "p50_ms": stats.percentile(50),
+                                               "p95_ms": stats.percentile(95)}
+                                       for stage, stats in self.stages.items()}},
+                          dump_file, indent=1)
+            else:
+                dump_file.write(",".join(columns) + "\n")
+                for record in self.records:
+                    dump_file.write(",".join(f"{value:.6f}" if isinstance(value, float) else str(value)
+                                             for value in record) + "\n")
+
+    def prometheus(self):
+        lines = ["# TYPE ascendio_input_latency_ms summary"]
+        with self.lock:
+            for stage, stats in self.stages.items():
+                for quantile in (0.5, 0.95, 0.99):
+                    lines.append(f'ascendio_input_latency_ms{{stage="{stage}",quantile="{quantile}"}} '
+                                 f"{stats.percentile(quantile * 100):.3f}")
+                lines.append(f'ascendio_input_latency_ms_count{{stage="{stage}"}} {stats.frames}')
+            lines.append("# TYPE ascendio_dropped_jumps_total counter")
+            lines.append(f"ascendio_dropped_jumps_total {self.dropped}")
+        return "\n".join(lines) + "\n"
+
+def serve_metrics(tracker, port):
+    # Local-only scrape endpoint; any path returns the metrics page
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = tracker.prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    except OSError as e:
+        print(f"🔮 Metrics endpoint unavailable on port {port}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"🔮 Metrics at http://127.0.0.1:{port}/metrics")
+    return server
+
+latency = LatencyTracker(PLAYERS)
+metrics_server = serve_metrics(latency, METRICS_PORT) if METRICS_PORT else None
+latency_overlay = LATENCY_OVERLAY
+
+# ------------------ Run Statistics ------------------
+# One row per level attempt. All SQLite work happens on a writer thread that
+# batches inserts and refreshes the cached leaderboard, so the render loop only
+# ever touches a queue and a dict.
+RUN_SCHEMA = (("started_at", "REAL"), ("level", "INTEGER"), ("outcome", "TEXT"), ("score", "INTEGER"),
+              ("duration_s", "REAL"), ("jumps", "INTEGER"), ("collisions", "INTEGER"), ("avg_fps", "REAL"),
+              ("detector_ms", "REAL"), ("input_latency_ms", "REAL"), ("control_mode", "TEXT"),
+              ("players", "INTEGER"))
+RUN_COLUMNS = tuple(column for column, _ in RUN_SCHEMA)
+
+class RunStore:
+    def __init__(self, path, batch_size=32, flush_interval=1.0, leaderboard_size=5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.leaderboard_size = leaderboard_size
+        self.pending = queue.Queue()
+        self.failed = False  # set when the writer could not open the database
+        self.leaders = {}  # level -> [(score, started_at)], replaced wholesale by the writer
+        self.thread = threading.Thread(target=self.writer, daemon=True)
+        self.thread.start()
+
+    def record(self, run):
+        if self.failed:
+            return
+        self.pending.put(tuple(run[column] for column in RUN_COLUMNS))
+
+    def best(self, level):
+        leaders = self.leaders.get(level)
+        return leaders[0][0] if leaders else None
+
+    def connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(f"CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, "
+                           f"{', '.join(f'{column} {kind}' for column, kind in RUN_SCHEMA)})")
+        connection.execute("CREATE INDEX IF NOT EXISTS runs_leaderboard ON runs (level, score DESC)")
+        return connection
+
+    def refresh_leaders(self, connection):
+        leaders = {}
+        for (level,) in connection.execute("SELECT DISTINCT level FROM runs").fetchall():
+            leaders[level] = connection.execute(
+                "SELECT score, started_at FROM runs WHERE level = ? ORDER BY score DESC LIMIT ?",
+                (level, self.leaderboard_size)).fetchall()
+        self.leaders = leaders
+
+    def writer(self):
+        try:
+            connection = self.connect()
+            self.refresh_leaders(connection)
+        except sqlite3.Error as e:
+            print(f"🔮 Run statistics disabled ({self.path}): {e}")
+            self.failed = True
+            return
+        placeholders = ", ".join("?" for _ in RUN_COLUMNS)
+        insert = f"INSERT INTO runs ({', '.join(RUN_COLUMNS)}) VALUES ({placeholders})"
+        done = False
+        while not done:
+            try:
+                batch = [self.pending.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            # Collect whatever else is queued, up to one batch
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                done = True
+                batch = [row for row in batch if row is not None]
+            if batch:
+                try:
+                    with connection:
+                        connection.executemany(insert, batch)
+                    self.refresh_leaders(connection)
+                except sqlite3.Error as e:
+                    print(f"🔮 Could not save {len(batch)} runs: {e}")
+        connection.close()
+
+    def close(self, timeout=2.0):
+        # Flushes queued runs; the sentinel is behind every record already queued
+        if self.failed:
+            return
+        self.pending.put(None)
+        self.thread.join(timeout)
+
+# Benchmark runs are not real attempts and stay out of the leaderboard
+run_store = RunStore(STATS_DB, leaderboard_size=LEADERBOARD_SIZE) if STATS_DB and not BENCHMARK_FRAMES else None
+
 # Particle list
 particles = []
 
+def spawn_particle(x, y, color, vel_x=None, vel_y=None):
+    # All particle spawns go through the quality tier's chance and cap
+    tier = quality.tier
+    if len(particles) < min(tier["particle_cap"], PARTICLE_LIMIT) and random.random() < tier["spawn_chance"]:
+        particles.append(MagicParticle(x, y, color, vel_x, vel_y))
+
 # ------------------ Load Obstacles ------------------
 def load_obstacle_images():
     obstacles_imgs = []
@@ -117,19 +786,65 @@ def load_obstacle_images():
 
 obstacle_images = load_obstacle_images()
 
+# Pre-rotated frames per (image, steps); each frame is rendered the first time it is needed
+rotation_atlases = {}
+
+def rotated_image(image, angle, steps):
+    atlas = rotation_atlases.get((image, steps))
+    if atlas is None:
+        atlas = rotation_atlases[(image, steps)] = [None] * steps
+    index = int(angle % 360 * steps / 360)
+    if atlas[index] is None:
+        atlas[index] = pygame.transform.rotate(image, index * 360 / steps)
+    return atlas[index]
+
+# Collision masks matching each rotation atlas entry, built alongside on first use
+rotation_masks = {}
+
+def rotated_mask(image, angle, steps):
+    masks = rotation_masks.get((image, steps))
+    if masks is None:
+        masks = rotation_masks[(image, steps)] = [None] * steps
+    index = int(angle % 360 * steps / 360)
+    if masks[index] is None:
+        masks[index] = pygame.mask.from_surface(rotated_image(image, angle, steps))
+    return masks[index]
+
 # ------------------ Game Objects ------------------
+# Effect sprites the objects below used to rebuild every frame
+PLAYER_GLOW = pygame.Surface((80, 100), pygame.SRCALPHA)
+pygame.draw.ellipse(PLAYER_GLOW, (*MYSTIC_PURPLE, 40), PLAYER_GLOW.get_rect())
+SCAR_GLOW = pygame.Surface((10, 10), pygame.SRCALPHA)
+pygame.draw.line(SCAR_GLOW, (*CRIMSON, 180), (3, 2), (5, 5), 3)
+pygame.draw.line(SCAR_GLOW, (*CRIMSON, 180), (5, 5), (7, 4), 3)
+SNITCH_GLOW = pygame.Surface((50, 50), pygame.SRCALPHA)
+pygame.draw.circle(SNITCH_GLOW, (*ENCHANTED_GOLD, 80), (25, 25), 25)
+ORB_GLOWS = {}  # by glow radius, which follows Obstacle.pulse (30-40)
+letter_glyphs = {}
+
+def orb_glow(radius):
+    glow = ORB_GLOWS.get(radius)
+    if glow is None:
+        glow = ORB_GLOWS[radius] = pygame.Surface((100, 100), pygame.SRCALPHA)
+        pygame.draw.circle(glow, (*DEEP_PURPLE, 60), (50, 50), radius)
+    return glow
+
 class Player:
-    def __init__(self):
+    def __init__(self, x=WIDTH // 2 - 25, hat_color=DEEP_PURPLE, label=None):
         self.width = 50
         self.height = 70
-        self.x = WIDTH // 2 - 25
+        self.x = x
         self.y = HEIGHT - 170
         self.velocity_y = 0
         self.is_jumping = False
         self.ground_y = HEIGHT - 170
         self.animation_offset = 0
         self.wand_sparkle_timer = 0
-        self.trail_particles = []
+        self.hat_color = hat_color
+        self.label = font_tiny.render(label, True, SILVERY_WHITE) if label else None
+        self.alive = True
+        self.jumps = 0
+        self.prev_y = self.y
         
     def draw(self, screen):
         # Animated floating effect
@@ -137,9 +852,8 @@ class Player:
         draw_y = self.y + self.animation_offset
         
         # Magical aura glow
-        glow_surface = pygame.Surface((self.width + 30, self.height + 30), pygame.SRCALPHA)
-        pygame.draw.ellipse(glow_surface, (*MYSTIC_PURPLE, 40), glow_surface.get_rect())
-        screen.blit(glow_surface, (self.x - 15, draw_y - 15))
+        if quality.tier["glow"]:
+            screen.blit(PLAYER_GLOW, (self.x - 15, draw_y - 15))
         
         # Cape/Cloak (flowing effect)
         cape_points = [
@@ -165,8 +879,8 @@ class Player:
             (self.x + 12, draw_y + 18),
             (self.x + 38, draw_y + 18)
         ]
-        pygame.draw.polygon(screen, DEEP_PURPLE, hat_points)
-        pygame.draw.ellipse(screen, DEEP_PURPLE, (self.x + 8, draw_y + 15, 34, 8))
+        pygame.draw.polygon(screen, self.hat_color, hat_points)
+        pygame.draw.ellipse(screen, self.hat_color, (self.x + 8, draw_y + 15, 34, 8))
         pygame.draw.line(screen, ENCHANTED_GOLD, (self.x + 10, draw_y + 17), (self.x + 40, draw_y + 17), 2)
         # Moon and stars on hat
         pygame.draw.circle(screen, ENCHANTED_GOLD, (int(self.x + 20), int(draw_y + 5)), 3)
@@ -178,10 +892,7 @@ class Player:
         pygame.draw.line(screen, SHADOW_BLACK, (self.x + 24, draw_y + 24), (self.x + 26, draw_y + 24), 2)
         
         # Lightning scar (glowing)
-        scar_glow = pygame.Surface((10, 10), pygame.SRCALPHA)
-        pygame.draw.line(scar_glow, (*CRIMSON, 180), (3, 2), (5, 5), 3)
-        pygame.draw.line(scar_glow, (*CRIMSON, 180), (5, 5), (7, 4), 3)
-        screen.blit(scar_glow, (self.x + 22, draw_y + 16))
+        screen.blit(SCAR_GLOW, (self.x + 22, draw_y + 16))
         
         # Eyes with slight glow
         pygame.draw.circle(screen, SPELL_BLUE, (int(self.x + 20), int(draw_y + 24)), 2)
@@ -195,8 +906,8 @@ class Player:
         # Wand sparkles
         self.wand_sparkle_timer += 1
         if self.wand_sparkle_timer % 5 == 0:
-            particles.append(MagicParticle(wand_end_x, wand_end_y, ENCHANTED_GOLD, 
-                                          random.uniform(-1, 1), random.uniform(-2, 0)))
+            spawn_particle(wand_end_x, wand_end_y, ENCHANTED_GOLD,
+                           random.uniform(-1, 1), random.uniform(-2, 0))
         
         # Spell circle (rotating)
         angle = pygame.time.get_ticks() * 0.003
@@ -205,31 +916,48 @@ class Player:
             px = wand_end_x + math.cos(angle_offset) * 8
             py = wand_end_y + math.sin(angle_offset) * 8
             pygame.draw.circle(screen, ENCHANTED_GOLD, (int(px), int(py)), 2)
+        
+        if self.label:
+            screen.blit(self.label, self.label.get_rect(midbottom=(self.x + 25, draw_y - 12)))
     
     def jump(self):
-        if not self.is_jumping:
+        if self.alive and not self.is_jumping:
             self.is_jumping = True
             self.velocity_y = -20
+            self.jumps += 1
             # Spawn jump particles
             for _ in range(15):
-                particles.append(MagicParticle(self.x + 25, self.y + 60, MYSTIC_PURPLE))
+                spawn_particle(self.x + 25, self.y + 60, MYSTIC_PURPLE)
+            return True
+        return False
+    
+    def hitbox(self, ticks):
+        # (mask, left, top, dx, dy): the silhouette where it was drawn, and this frame's motion
+        return PLAYER_MASK, int(self.x), int(self.y + self.animation_offset) - 8, 0, int(self.y - self.prev_y)
     
     def update(self):
+        self.prev_y = self.y
         if self.is_jumping:
             self.velocity_y += 1.0
             self.y += self.velocity_y
             # Trail particles while jumping
             if random.random() > 0.7:
-                particles.append(MagicParticle(self.x + 25, self.y + 35, SPELL_BLUE, 0, 1))
+                spawn_particle(self.x + 25, self.y + 35, SPELL_BLUE, 0, 1)
             if self.y >= self.ground_y:
                 self.y = self.ground_y
                 self.is_jumping = False
                 self.velocity_y = 0
                 # Landing particles
                 for _ in range(10):
-                    particles.append(MagicParticle(self.x + 25, self.y + 60, EMERALD))
+                    spawn_particle(self.x + 25, self.y + 60, EMERALD)
         self.x = max(50, min(self.x, WIDTH - 100))
 
+def create_players(count):
+    # Co-op wizards stand side by side and share one world
+    if count == 1:
+        return [Player()]
+    return [Player(WIDTH // 2 - 125, DEEP_PURPLE, "P1"), Player(WIDTH // 2 + 75, CRIMSON, "P2")]
+
 class Obstacle:
     def __init__(self, x, speed, has_image=False, image=None):
         self.width = 60
@@ -242,24 +970,38 @@ class Obstacle:
         self.float_offset = random.uniform(0, math.pi * 2)
         self.rotation = 0
         
+    def float_y(self, ticks):
+        return self.y + math.sin(ticks * 0.003 + self.float_offset) * 5
+    
+    def pulse(self, ticks):
+        return math.sin(ticks * 0.008) * 5 + 25
+    
+    def hitbox(self, ticks):
+        float_y = self.float_y(ticks)
+        if self.has_image and self.image:
+            steps = quality.tier["rotation_steps"]
+            mask = rotated_mask(self.image, self.rotation, steps)
+            w, h = mask.get_size()
+            return (mask, int(self.x + self.width // 2 - w // 2), int(float_y + self.height // 2 - h // 2),
+                    -self.speed, 0)
+        return ORB_MASKS[int(self.pulse(ticks)) - ORB_MIN_RADIUS], int(self.x), int(float_y), -self.speed, 0
+    
     def draw(self, screen):
         # Floating animation
-        float_y = self.y + math.sin(pygame.time.get_ticks() * 0.003 + self.float_offset) * 5
+        float_y = self.float_y(pygame.time.get_ticks())
         
         if self.has_image and self.image:
             # Rotate image slightly for effect
-            rotated = pygame.transform.rotate(self.image, self.rotation)
+            rotated = rotated_image(self.image, self.rotation, quality.tier["rotation_steps"])
             rect = rotated.get_rect(center=(self.x + self.width//2, float_y + self.height//2))
             screen.blit(rotated, rect)
         else:
             # Dark curse orb with pulsing effect
-            pulse = math.sin(pygame.time.get_ticks() * 0.008) * 5 + 25
+            pulse = self.pulse(pygame.time.get_ticks())
             
             # Outer glow
-            glow_surface = pygame.Surface((self.width + 40, self.height + 40), pygame.SRCALPHA)
-            pygame.draw.circle(glow_surface, (*DEEP_PURPLE, 60), 
-                             (self.width//2 + 20, self.height//2 + 20), int(pulse + 10))
-            screen.blit(glow_surface, (self.x - 20, float_y - 20))
+            if quality.tier["glow"]:
+                screen.blit(orb_glow(int(pulse + 10)), (self.x - 20, float_y - 20))
             
             # Main orb
             pygame.draw.circle(screen, DEEP_PURPLE, (int(self.x + 30), int(float_y + 30)), int(pulse))
@@ -283,9 +1025,9 @@ class Obstacle:
         
         # Particle trail
         if random.random() > 0.8:
-            particles.append(MagicParticle(self.x + 30, float_y + 30, DEEP_PURPLE, -2, 0))
+            spawn_particle(self.x + 30, float_y + 30, DEEP_PURPLE, -2, 0)
         
-        self.rotation += 1
+        self.rotation = (self.rotation + 1) % 360
     
     def update(self):
         self.x -= self.speed
@@ -305,19 +1047,27 @@ class Letter:
         self.float_offset = random.uniform(0, math.pi * 2)
         self.rotation = 0
         
+    def float_y(self, ticks):
+        return self.y + math.sin(ticks * 0.004 + self.float_offset) * 8
+    
+    def hitbox(self, ticks):
+        # Wing tips move at most a pixel or two, so the flap is quantized to SNITCH_MASKS frames
+        flap = round(math.sin(math.sin(ticks * 0.01) * 0.3) * 5)
+        mask = SNITCH_MASKS[flap + SNITCH_FLAP]
+        return mask, int(self.x) - 8, int(self.float_y(ticks)) - 1, -self.speed, 0
+    
     def draw(self, screen):
         if not self.collected:
             # Floating animation
-            float_y = self.y + math.sin(pygame.time.get_ticks() * 0.004 + self.float_offset) * 8
+            float_y = self.float_y(pygame.time.get_ticks())
             
             # Golden Snitch body with shimmer
             shimmer = math.sin(pygame.time.get_ticks() * 0.01) * 10 + 245
             gold_color = (int(shimmer), int(shimmer * 0.75), 20)
             
             # Glow effect
-            glow_surface = pygame.Surface((50, 50), pygame.SRCALPHA)
-            pygame.draw.circle(glow_surface, (*ENCHANTED_GOLD, 80), (25, 25), 25)
-            screen.blit(glow_surface, (self.x - 7, float_y - 7))
+            if quality.tier["glow"]:
+                screen.blit(SNITCH_GLOW, (self.x - 7, float_y - 7))
             
             # Main golden sphere
             pygame.draw.circle(screen, gold_color, (int(self.x + 17), int(float_y + 17)), 18)
@@ -347,14 +1097,16 @@ class Letter:
             pygame.draw.polygon(screen, MIST_GRAY, right_wing, 1)
             
             # Letter on snitch
-            text = font_medium.render(self.char, True, MIDNIGHT_BLUE)
+            text = letter_glyphs.get(self.char)
+            if text is None:
+                text = letter_glyphs[self.char] = font_medium.render(self.char, True, MIDNIGHT_BLUE)
             text_rect = text.get_rect(center=(self.x + 17, float_y + 17))
             screen.blit(text, text_rect)
             
             # Sparkle particles
             if random.random() > 0.85:
-                particles.append(MagicParticle(self.x + 17, float_y + 17, ENCHANTED_GOLD, 
-                                              random.uniform(-1, 1), random.uniform(-1, 1)))
+                spawn_particle(self.x + 17, float_y + 17, ENCHANTED_GOLD,
+                               random.uniform(-1, 1), random.uniform(-1, 1))
     
     def update(self):
         self.x -= self.speed
@@ -369,26 +1121,27 @@ class Button:
         self.color = color
         self.hover_color = hover_color
         self.is_hovered = False
+        # Text and hover glow never change, so render them once
+        self.text_shadow = font_small.render(text, True, SHADOW_BLACK)
+        self.text_surf = font_small.render(text, True, SILVERY_WHITE)
+        self.glow_surface = pygame.Surface((width + 20, height + 20), pygame.SRCALPHA)
+        pygame.draw.rect(self.glow_surface, (*hover_color, 60), self.glow_surface.get_rect(), border_radius=15)
         
     def draw(self, screen):
         color = self.hover_color if self.is_hovered else self.color
         
         # Glowing effect when hovered
-        if self.is_hovered:
-            glow_surface = pygame.Surface((self.rect.width + 20, self.rect.height + 20), pygame.SRCALPHA)
-            pygame.draw.rect(glow_surface, (*self.hover_color, 60), glow_surface.get_rect(), border_radius=15)
-            screen.blit(glow_surface, (self.rect.x - 10, self.rect.y - 10))
+        if self.is_hovered and quality.tier["glow"]:
+            screen.blit(self.glow_surface, (self.rect.x - 10, self.rect.y - 10))
         
         # Button background with gradient effect
         pygame.draw.rect(screen, color, self.rect, border_radius=12)
         pygame.draw.rect(screen, ENCHANTED_GOLD, self.rect, 3, border_radius=12)
         
         # Text with shadow
-        text_shadow = font_small.render(self.text, True, SHADOW_BLACK)
-        text_surf = font_small.render(self.text, True, SILVERY_WHITE)
-        text_rect = text_surf.get_rect(center=self.rect.center)
-        screen.blit(text_shadow, (text_rect.x + 2, text_rect.y + 2))
-        screen.blit(text_surf, text_rect)
+        text_rect = self.text_surf.get_rect(center=self.rect.center)
+        screen.blit(self.text_shadow, (text_rect.x + 2, text_rect.y + 2))
+        screen.blit(self.text_surf, text_rect)
     
     def check_hover(self, pos):
         self.is_hovered = self.rect.collidepoint(pos)
@@ -404,53 +1157,486 @@ LEVELS = [
     {"name": "Third Year", "phrase": "EXPECTOPATRONUM", "description": "* Summon Your Guardian", "speed": 8, "spawn_rate_obstacle": 65, "spawn_rate_letter": 85}
 ]
 
+STORY_LINES = [
+    "In the depths of the Forbidden Forest,",
+    "dark curses have been unleashed...",
+    "",
+    "As a young wizard at Hogwarts,",
+    "you must master powerful spells",
+    "to survive the enchanted trials.",
+    "",
+    "Collect magical letters to complete",
+    "ancient incantations while dodging",
+    "the cursed obstacles in your path.",
+    "",
+    "Only the bravest can master",
+    "the art of spell-casting!",
+    "",
+    "Will you rise to the challenge?"
+]
+
 # ------------------ Hand Detection Logic ------------------
-def is_open_hand(hand_landmarks):
-    tips = [8, 12, 16, 20]
-    mcp  = [5, 9, 13, 17]
-    open_count = 0
-    for tip_idx, mcp_idx in zip(tips, mcp):
-        if hand_landmarks[tip_idx].y < hand_landmarks[mcp_idx].y:
-            open_count += 1
+FINGER_TIPS = [8, 12, 16, 20]
+FINGER_MCPS = [5, 9, 13, 17]
+
+def landmark_array(multi_hand_landmarks):
+    # (hands, 21, 2) array of normalized x, y for every detected hand
+    return np.array([[(lm.x, lm.y) for lm in hand.landmark] for hand in multi_hand_landmarks],
+                    dtype=np.float32)
+
+def is_open_hand(points):
+    # Works on one hand (21, 2) or a batch (hands, 21, 2): a finger is open
+    # when its tip is above its knuckle, and 3+ open fingers make an open hand
+    open_count = (points[..., FINGER_TIPS, 1] < points[..., FINGER_MCPS, 1]).sum(axis=-1)
     return open_count >= 3
 
+def assign_hands(screen_x, players):
+    # Player 1 stands on the left; screen_x is each hand's 0..1 position on screen
+    if players == 1:
+        return [0] * len(screen_x)
+    if len(screen_x) >= players:
+        # Enough hands for everyone: order them left to right
+        assignment = [players - 1] * len(screen_x)
+        for player_idx, hand_idx in enumerate(np.argsort(screen_x)[:players]):
+            assignment[hand_idx] = player_idx
+        return assignment
+    return [min(players - 1, int(x * players)) for x in screen_x]
+
+class GestureState:
+    # Rising-edge detector with debounce: one jump per hand opening
+    def __init__(self, debounce_time=0.3):
+        self.debounce_time = debounce_time
+        self.last_state = False
+        self.last_jump_time = 0
+
+    def update(self, detected, current_time):
+        fire = detected and not self.last_state and (current_time - self.last_jump_time) > self.debounce_time
+        if fire:
+            self.last_jump_time = current_time
+        self.last_state = detected
+        return fire
+
+# ------------------ Gesture Backends ------------------
+# A backend turns an RGB detector frame into a list of (screen_x, is_open) per hand,
+# with screen_x in 0..1 from the left edge of the (mirrored) screen.
+class GestureBackend:
+    name = "base"
+    needs_camera = True
+
+    def process(self, rgb_frame):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class MediaPipeBackend(GestureBackend):
+    name = "mediapipe"
+
+    def __init__(self, max_hands):
+        # Imported here so the other backends never pay for loading MediaPipe
+        import mediapipe as mp
+        self.hands = mp.solutions.hands.Hands(
+            min_detection_confidence=0.7,
+            min_tracking_confidence=0.5,
+            max_num_hands=max_hands
+        )
+
+    def process(self, rgb_frame):
+        results = self.hands.process(rgb_frame)
+        if not results.multi_hand_landmarks:
+            return []
+        points = landmark_array(results.multi_hand_landmarks)
+        # The frame is unmirrored, so the wrist's screen position is 1 - x
+        return list(zip((1 - points[:, 0, 0]).tolist(), is_open_hand(points).tolist()))
+
+    def close(self):
+        self.hands.close()
+
+# YCrCb skin range and the finger valley rules used by ContourBackend
+SKIN_LOW = np.array([0, 133, 77], dtype=np.uint8)
+SKIN_HIGH = np.array([255, 173, 127], dtype=np.uint8)
+MIN_HAND_AREA = 0.03  # fraction of the detector frame
+MIN_VALLEY_DEPTH = 0.15  # fraction of the hand's bounding box height
+
+class ContourBackend(GestureBackend):
+    # OpenCV only: skin segmentation, then convexity defects of the largest blobs.
+    # Two or more deep, narrow valleys between fingers means 3+ spread fingers.
+    name = "contour"
+
+    def __init__(self, max_hands, size=DETECTOR_SIZE):
+        self.max_hands = max_hands
+        self.ycrcb = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        self.mask = np.empty((size[1], size[0]), dtype=np.uint8)
+        self.kernel = np.ones((3, 3), dtype=np.uint8)
+        self.width = size[0]
+        self.min_area = size[0] * size[1] * MIN_HAND_AREA
+
+    def count_valleys(self, contour, height):
+        hull = cv2.convexHull(contour, returnPoints=False)
+        if len(hull) < 4:
+            return 0
+        try:
+            defects = cv2.convexityDefects(contour, hull)
+        except cv2.error:
+            return 0
+        if defects is None:
+            return 0
+        start, end, far, depth = defects.reshape(-1, 4).T
+        points = contour.reshape(-1, 2).astype(np.float32)
+        a = np.linalg.norm(points[end] - points[start], axis=1)
+        b = np.linalg.norm(points[far] - points[start], axis=1)
+        c = np.linalg.norm(points[end] - points[far], axis=1)
+        cosine = (b ** 2 + c ** 2 - a ** 2) / np.maximum(2 * b * c, 1e-6)
+        valleys = (cosine > 0) & (depth / 256.0 > height * MIN_VALLEY_DEPTH)
+        return int(valleys.sum())
+
+    def process(self, rgb_frame):
+        cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2YCrCb, dst=self.ycrcb)
+        cv2.inRange(self.ycrcb, SKIN_LOW, SKIN_HIGH, dst=self.mask)
+        cv2.morphologyEx(self.mask, cv2.MORPH_OPEN, self.kernel, dst=self.mask)
+        contours, _ = cv2.findContours(self.mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        hands = []
+        for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:self.max_hands]:
+            if cv2.contourArea(contour) < self.min_area:
+                break
+            x, y, w, h = cv2.boundingRect(contour)
+            hands.append((1 - (x + w / 2) / self.width, self.count_valleys(contour, h) >= 2))
+        return hands
+
+class ReplayBackend(GestureBackend):
+    # Plays back a gesture log (see GestureLog) at its recorded timing, looping
+    name = "replay"
+    needs_camera = False
+
+    def __init__(self, path):
+        with open(path) as log_file:
+            self.rows = [json.loads(line) for line in log_file if line.strip()]
+        self.times = [row["t"] for row in self.rows]
+        self.start = time.time()
+
+    def process(self, rgb_frame):
+        if not self.rows:
+            return []
+        elapsed = (time.time() - self.start) % (self.times[-1] + 0.001)
+        row = self.rows[max(0, bisect.bisect_right(self.times, elapsed) - 1)]
+        return [tuple(hand) for hand in row["hands"]]
+
+def detector_names():
+    return ["mediapipe", "contour"] + (["replay"] if GESTURE_REPLAY else [])
+
+def create_detector(name):
+    # May return a different backend than asked for; callers compare against the
+    # requested name, not the backend's, so a fallback is only created once
+    if name == "replay":
+        try:
+            return ReplayBackend(GESTURE_REPLAY)
+        except OSError as error:
+            print(f"🔮 Cannot read gesture replay {GESTURE_REPLAY!r} ({error}) - using the contour detector")
+            return ContourBackend(PLAYERS)
+    if name == "mediapipe":
+        try:
+            return MediaPipeBackend(PLAYERS)
+        except (ImportError, AttributeError):
+            print("🔮 MediaPipe Hands not available - using the contour detector")
+    return ContourBackend(PLAYERS)
+
+class GestureLog:
+    # JSON lines of {"frame", "t", "hands": [[screen_x, is_open], ...]}; used for
+    # replay and as ground-truth labels for detector benchmarks
+    def __init__(self, path):
+        # Line buffered: the detector thread is a daemon and may never reach close()
+        self.file = open(path, "w", buffering=1)
+        self.start = time.time()
+        self.frame = 0
+
+    def write(self, hands):
+        row = {"frame": self.frame, "t": round(time.time() - self.start, 4),
+               "hands": [[round(x, 4), bool(is_open)] for x, is_open in hands]}
+        self.file.write(json.dumps(row) + "\n")
+        self.frame += 1
+
+    def close(self):
+        self.file.close()
+
+def benchmark_detectors(clip_path, labels_path=""):
+    # Runs every camera backend over the same clip and reports latency, CPU and
+    # accuracy of the per-frame "any open hand" signal. Without labels, the
+    # first backend's output is the reference.
+    labels = None
+    if labels_path:
+        with open(labels_path) as label_file:
+            labels = [any(is_open for _, is_open in json.loads(line)["hands"])
+                      for line in label_file if line.strip()]
+    for name in [n for n in detector_names() if n != "replay"]:
+        backend = create_detector(name)
+        capture = cv2.VideoCapture(clip_path)
+        pipeline = FramePipeline()
+        latency, cpu, outputs = FrameStats(100000), FrameStats(100000), []
+        while True:
+            rgb_frame = pipeline.read(capture)
+            if rgb_frame is None:
+                break
+            wall_start, cpu_start = time.perf_counter(), time.thread_time()
+            hands = backend.process(rgb_frame)
+            latency.add((time.perf_counter() - wall_start) * 1000)
+            cpu.add((time.thread_time() - cpu_start) * 1000)
+            outputs.append(any(is_open for _, is_open in hands))
+        capture.release()
+        backend.close()
+        if labels is None:
+            labels = outputs
+        matched = sum(1 for out, label in zip(outputs, labels) if out == label)
+        accuracy = matched / max(1, min(len(outputs), len(labels)))
+        print(f"🔮 {backend.name:10s} latency {latency.mean():6.2f} ms (p95 {latency.percentile(95):6.2f}), "
+              f"CPU {cpu.mean():6.2f} ms, accuracy {accuracy:6.1%} over {len(outputs)} frames")
+
+detector = None
+detector_request = DETECTOR  # the main loop asks for a switch, the detector thread performs it
+if detector_request not in detector_names():
+    print(f"🔮 Gesture detector {DETECTOR!r} not available; choose {', '.join(detector_names())} (replay needs ASCENDIO_GESTURE_REPLAY) - using mediapipe")
+    detector_request = "mediapipe"
+
 def hand_detection_thread():
-    global jump_triggered, running
-    last_state = False
-    debounce_time = 0.3
-    last_jump_time = 0
+    global detector
+    gestures = [GestureState() for _ in range(PLAYERS)]
+    gesture_log = GestureLog(GESTURE_LOG) if GESTURE_LOG else None
+    detector_built_for = None  # the request the current backend was created for
     while running and webcam_available:
-        if hand_control_enabled:
-            ret, frame = cap.read()
-            if ret:
-                frame = cv2.flip(frame, 1)
-                small_frame = cv2.resize(frame, (160, 120))
-                rgb_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-                rgb_frame.flags.writeable = False
-                results = hands.process(rgb_frame)
-                detected = False
-                if results.multi_hand_landmarks:
-                    hand_landmarks = results.multi_hand_landmarks[0]
-                    if is_open_hand(hand_landmarks.landmark):
-                        detected = True
+        iteration_start = time.time()
+        if detector is None or detector_built_for != detector_request:
+            # Backends are created and closed on this thread so none is used while closing
+            if detector is not None:
+                detector.close()
+            detector_built_for = detector_request
+            detector = create_detector(detector_built_for)
+            print(f"🔮 Gesture detector: {detector.name}")
+        if hand_control_enabled and detector_idle:
+            # Keep the camera buffer fresh without decoding or running inference
+            cap.grab()
+            for gesture in gestures:
+                gesture.last_state = False
+        elif hand_control_enabled:
+            cpu_start = time.thread_time()
+            rgb_frame = frame_pipeline.read(cap) if detector.needs_camera else None
+            captured = time.perf_counter()
+            if rgb_frame is not None or not detector.needs_camera:
+                hands = detector.process(rgb_frame)
+                inferred = time.perf_counter()
+                if gesture_log:
+                    gesture_log.write(hands)
+                detected = [False] * PLAYERS
+                screen_x = [x for x, _ in hands]
+                for player_idx, (_, is_open) in zip(assign_hands(screen_x, PLAYERS), hands):
+                    detected[player_idx] = detected[player_idx] or is_open
 
                 current_time = time.time()
-                if detected and not last_state and (current_time - last_jump_time) > debounce_time:
-                    with jump_lock:
-                        jump_triggered = True
-                    last_jump_time = current_time
+                for player_idx, gesture in enumerate(gestures):
+                    if gesture.update(detected[player_idx], current_time):
+                        with jump_lock:
+                            jump_triggered[player_idx] = True
+                            latency.enqueue(player_idx, captured, inferred)
+                detector_stats.add((time.thread_time() - cpu_start) * 1000)
+        # Detector rate follows the quality tier; inference time counts against the period
+        period = 1.0 / (IDLE_DETECTOR_FPS if detector_idle else quality.tier["detector_fps"])
+        time.sleep(max(0.005, period - (time.time() - iteration_start)))
+    if gesture_log:
+        gesture_log.close()
 
-                last_state = detected
-        time.sleep(0.02)
+if BENCHMARK_DETECTORS:
+    benchmark_detectors(BENCHMARK_DETECTORS, BENCHMARK_LABELS)
+    pygame.quit()
+    sys.exit()
 
 if webcam_available:
     threading.Thread(target=hand_detection_thread, daemon=True).start()
 
+# ------------------ Starfield ------------------
+# Pixel offsets covered by pygame.draw.circle at radius 1, and the extra ones at radius 2
+STAR_SMALL_OFFSETS = [(-1, -1), (0, -1), (-1, 0), (0, 0)]
+STAR_BIG_OFFSETS = [(-1, -2), (0, -2), (-2, -1), (1, -1), (-2, 0), (1, 0), (-1, 1), (0, 1)]
+STAR_PARALLAX = [0.05, 0.1, 0.2]  # fraction of the level speed per parallax layer
+STAR_SHADES = 64
+# Shooting stars run on wall time so menus redrawn at any rate animate the same
+SHOOTING_STAR_VELOCITY = (480, -240)  # pixels per second
+SHOOTING_STAR_LIFE = 1 / 3  # seconds
+SHOOTING_STAR_RATE = 0.6  # spawns per second
+
+class Starfield:
+    # Twinkling stars and shooting stars kept in NumPy arrays. Brightness is computed
+    # for all stars at once and written straight into the surface pixels, so the
+    # per-frame Python cost does not grow with the number of stars.
+    def __init__(self, count, width, height, max_shooting=4):
+        self.width = width
+        self.height = height
+        self.rng = np.random.default_rng()
+        self.x = self.rng.integers(0, width, count).astype(np.float32)
+        self.y = self.rng.integers(0, height, count).astype(np.intp)
+        self.phase = np.arange(count, dtype=np.float32) * 0.5
+        self.speed = np.array(STAR_PARALLAX, dtype=np.float32)[np.arange(count) % len(STAR_PARALLAX)]
+        self.shades = None
+        self.sprites = None
+        # Shooting stars: fixed-size pool, a star is alive while its life is positive
+        self.shooting_x = np.zeros(max_shooting, dtype=np.float32)
+        self.shooting_y = np.zeros(max_shooting, dtype=np.float32)
+        self.shooting_life = np.zeros(max_shooting, dtype=np.float32)  # seconds left
+
+    def update(self, scroll):
+        # Parallax drift while playing; stars wrap around horizontally
+        self.x -= self.speed * scroll
+        np.mod(self.x, self.width, out=self.x)
+
+    def update_shooting(self, dt):
+        alive = self.shooting_life > 0
+        self.shooting_x[alive] += SHOOTING_STAR_VELOCITY[0] * dt
+        self.shooting_y[alive] += SHOOTING_STAR_VELOCITY[1] * dt
+        self.shooting_life[alive] -= dt
+        if self.rng.random() < SHOOTING_STAR_RATE * dt and not alive.all():
+            slot = np.argmin(alive)
+            self.shooting_x[slot] = self.rng.integers(self.width // 4, self.width)
+            self.shooting_y[slot] = self.rng.integers(80, 250)
+            self.shooting_life[slot] = SHOOTING_STAR_LIFE
+
+    def draw(self, surface, time_offset, count):
+        count = min(count, len(self.x))
+        brightness = (np.sin(time_offset + self.phase[:count]) + 1) * 0.5
+        shade = (brightness * (STAR_SHADES - 1)).astype(np.intp)
+        big = brightness >= 0.5
+        xs = self.x[:count].astype(np.intp)
+        ys = self.y[:count]
+        if surface.get_bytesize() == 4:
+            self.draw_pixels(surface, xs, ys, shade, big)
+        else:
+            self.draw_sprites(surface, xs, ys, shade, big)
+        
+        for sx, sy in zip(self.shooting_x[self.shooting_life > 0], self.shooting_y[self.shooting_life > 0]):
+            for i in range(5):
+                pygame.draw.circle(surface, SILVERY_WHITE, (int(sx) - i * 10, int(sy) + i * 5), 2 - i//2)
+
+    def draw_pixels(self, surface, xs, ys, shade, big):
+        if self.shades is None:
+            self.shades = np.array([surface.map_rgb(tuple(int(c * level / (STAR_SHADES - 1)) for c in SILVERY_WHITE))
+                                    for level in range(STAR_SHADES)], dtype=np.int64).astype(np.uint32)
+        colors = self.shades[shade]
+        pixels = pygame.surfarray.pixels2d(surface)
+        w, h = pixels.shape
+        for dx, dy in STAR_SMALL_OFFSETS:
+            pixels[np.clip(xs + dx, 0, w - 1), np.clip(ys + dy, 0, h - 1)] = colors
+        bx, by, bcolors = xs[big], ys[big], colors[big]
+        for dx, dy in STAR_BIG_OFFSETS:
+            pixels[np.clip(bx + dx, 0, w - 1), np.clip(by + dy, 0, h - 1)] = bcolors
+        del pixels
+
+    def draw_sprites(self, surface, xs, ys, shade, big):
+        # Fallback for non 32-bit surfaces: pre-tinted star sprites in one blits() call
+        if self.sprites is None:
+            self.sprites = []
+            for level in range(STAR_SHADES):
+                color = tuple(int(c * level / (STAR_SHADES - 1)) for c in SILVERY_WHITE)
+                pair = []
+                for radius in (1, 2):
+                    sprite = pygame.Surface((4, 4), pygame.SRCALPHA)
+                    pygame.draw.circle(sprite, color, (2, 2), radius)
+                    pair.append(sprite)
+                self.sprites.append(pair)
+        surface.blits([(self.sprites[s][b], (x - 2, y - 2))
+                       for x, y, s, b in zip(xs.tolist(), ys.tolist(), shade.tolist(), big.tolist())], False)
+
+# ------------------ Cached Layers ------------------
+def compose(size, draw_fn):
+    # Draw once into a transparent surface so it can be blitted as a single sprite
+    layer = pygame.Surface(size, pygame.SRCALPHA)
+    draw_fn(layer)
+    return layer
+
+def draw_fog(surface):
+    for y in range(150):
+        alpha = int((y / 150) * 100)
+        pygame.draw.line(surface, (*DEEP_PURPLE, alpha), (0, y), (WIDTH, y))
+
+def draw_crystal_ball(surface):
+    pygame.draw.circle(surface, MYSTIC_PURPLE, (12, 12), 10)
+    pygame.draw.circle(surface, SILVERY_WHITE, (9, 9), 3)
+
+def draw_scroll(surface):
+    pygame.draw.rect(surface, (210, 180, 140), (2, 2, 16, 20), border_radius=2)
+    for y in (7, 12, 17):
+        pygame.draw.line(surface, SHADOW_BLACK, (5, y), (15, y), 1)
+
+def draw_owl(surface):
+    pygame.draw.circle(surface, (139, 69, 19), (12, 12), 10)
+    pygame.draw.circle(surface, SILVERY_WHITE, (8, 10), 3)
+    pygame.draw.circle(surface, SILVERY_WHITE, (16, 10), 3)
+    pygame.draw.circle(surface, BLACK, (8, 10), 2)
+    pygame.draw.circle(surface, BLACK, (16, 10), 2)
+
+def draw_wand(surface):
+    pygame.draw.line(surface, (101, 67, 33), (4, 4), (24, 24), 4)
+    pygame.draw.circle(surface, ENCHANTED_GOLD, (24, 24), 3)
+
+def build_symbol_sprites():
+    # (center x, sprite) for the welcome screen symbols, each centered on its anchor
+    return [
+        (WIDTH//2 - 100, compose((24, 24), draw_crystal_ball)),
+        (WIDTH//2, compose((20, 24), draw_scroll)),
+        (WIDTH//2 + 100, compose((24, 24), draw_owl)),
+        (WIDTH//2 + 200, compose((28, 28), draw_wand))
+    ]
+
+# ------------------ Collision ------------------
+# Entities expose hitbox(ticks) -> (mask, left, top, dx, dy). Silhouettes are
+# built once per animation frame; the wizard's wand, glows and particles do not hit.
+ORB_MIN_RADIUS, ORB_MAX_RADIUS = 20, 30  # range of Obstacle.pulse
+SNITCH_FLAP = 1  # wing offset in pixels either side of rest
+SWEEP_STEP = 8  # pixels of relative motion between narrowphase samples
+
+def draw_player_silhouette(surface):
+    # Player.draw shapes relative to (x, draw_y - 8), the hat tip
+    pygame.draw.polygon(surface, WHITE, [(25, 48), (10, 58), (5, 73), (45, 73), (40, 58)])
+    pygame.draw.ellipse(surface, WHITE, (8, 46, 34, 32))
+    pygame.draw.circle(surface, WHITE, (25, 33), 12)
+    pygame.draw.polygon(surface, WHITE, [(25, 0), (12, 26), (38, 26)])
+    pygame.draw.ellipse(surface, WHITE, (8, 23, 34, 8))
+
+def draw_snitch_silhouette(surface, flap):
+    # Letter.draw shapes relative to (x - 8, float_y - 1)
+    pygame.draw.circle(surface, WHITE, (25, 18), 18)
+    pygame.draw.polygon(surface, WHITE, [(13, 16), (0, 9 + flap), (3, 21), (13, 23)])
+    pygame.draw.polygon(surface, WHITE, [(37, 16), (50, 9 + flap), (47, 21), (37, 23)])
+
+def silhouette_mask(size, draw_fn):
+    return pygame.mask.from_surface(compose(size, draw_fn))
+
+PLAYER_MASK = silhouette_mask((50, 78), draw_player_silhouette)
+ORB_MASKS = [silhouette_mask((60, 60), lambda s, r=r: pygame.draw.circle(s, WHITE, (30, 30), r))
+             for r in range(ORB_MIN_RADIUS, ORB_MAX_RADIUS + 1)]
+SNITCH_MASKS = [silhouette_mask((51, 37), lambda s, f=f: draw_snitch_silhouette(s, f))
+                for f in range(-SNITCH_FLAP, SNITCH_FLAP + 1)]
+
+def entities_collide(a, b, ticks):
+    a_mask, ax, ay, adx, ady = a.hitbox(ticks)
+    b_mask, bx, by, bdx, bdy = b.hitbox(ticks)
+    aw, ah = a_mask.get_size()
+    bw, bh = b_mask.get_size()
+    # b's offset from a at the end of the frame, and how far it moved relative to a
+    ox, oy = bx - ax, by - ay
+    rdx, rdy = bdx - adx, bdy - ady
+    # Broadphase: a's box against the box b swept through this frame
+    if (min(ox, ox - rdx) >= aw or max(ox, ox - rdx) + bw <= 0 or
+            min(oy, oy - rdy) >= ah or max(oy, oy - rdy) + bh <= 0):
+        return False
+    # Narrowphase: masks at the end position, then stepping back along the path so
+    # fast movers cannot pass through a thin overlap. The start was tested last frame.
+    steps = max(1, math.ceil(max(abs(rdx), abs(rdy)) / SWEEP_STEP))
+    for i in range(steps):
+        t = i / steps
+        if a_mask.overlap(b_mask, (round(ox - rdx * t), round(oy - rdy * t))):
+            return True
+    return False
+
 # ------------------ Game Class ------------------
 class Game:
     def __init__(self):
-        self.state = "welcome"
-        self.player = Player()
+        self.players = create_players(PLAYERS)
         self.obstacles = []
         self.letters = []
         self.current_level = 0
@@ -460,36 +1646,65 @@ class Game:
         self.spawn_timer = 0
         self.letter_index = 0
         self.control_mode = "hand"
-        self.stars = [(random.randint(0, WIDTH), random.randint(0, HEIGHT - 200)) for _ in range(100)]
+        self.starfield = Starfield(STAR_COUNT, WIDTH, HEIGHT - 200)
+        self.last_update_ticks = pygame.time.get_ticks()
+        self.fog_surface = compose((WIDTH, 150), draw_fog)
+        self.run = None  # statistics of the level attempt in progress
+        self.scenes = {name: scene_class(self) for name, scene_class in SCENES.items()}
+        self.scene = None
+        self.state = "welcome"
+
+    @property
+    def state(self):
+        return self.scene.name
+
+    @state.setter
+    def state(self, name):
+        # Switching scenes runs their exit and enter hooks; staying put does nothing
+        if self.scene is not None:
+            if self.scene.name == name:
+                return
+            self.scene.exit()
+        self.scene = self.scenes[name]
+        self.scene.enter()
+
+    def handle_event(self, event, mouse_pos):
+        return self.scene.handle_event(event, mouse_pos)
+
+    def update(self, mouse_pos):
+        # The background animates in every scene; a long gap (focus loss) is not fast-forwarded
+        ticks = pygame.time.get_ticks()
+        self.starfield.update_shooting(min(0.1, (ticks - self.last_update_ticks) / 1000))
+        self.last_update_ticks = ticks
+        scene = self.scene
+        update_start = time.perf_counter()
+        scene.update(mouse_pos)
+        scene.update_stats.add((time.perf_counter() - update_start) * 1000)
+
+    def draw(self, screen):
+        self.draw_magical_background(screen)
         
-        self.story_button = Button(WIDTH//2 - 120, 480, 240, 55, "THE PROPHECY", DEEP_PURPLE, MYSTIC_PURPLE)
-        self.home_button = Button(WIDTH - 180, 15, 165, 45, "GREAT HALL", DEEP_PURPLE, MYSTIC_PURPLE)
+        # Update and draw particles
+        for particle in particles:
+            particle.update()
+            particle.draw(screen)
+        particles[:] = [particle for particle in particles if particle.life > 0]
+        
+        draw_start = time.perf_counter()
+        self.scene.draw(screen)
+        self.scene.draw_stats.add((time.perf_counter() - draw_start) * 1000)
         
     def draw_magical_background(self, screen):
         # Animated starry night
         screen.fill(MIDNIGHT_BLUE)
         
-        # Twinkling stars
-        time_offset = pygame.time.get_ticks() * 0.001
-        for i, (sx, sy) in enumerate(self.stars):
-            brightness = (math.sin(time_offset + i * 0.5) + 1) * 0.5
-            star_color = tuple(int(c * brightness) for c in SILVERY_WHITE)
-            size = 1 if brightness < 0.5 else 2
-            pygame.draw.circle(screen, star_color, (sx, sy), size)
-        
-        # Shooting stars occasionally
-        if random.random() > 0.98:
-            sx = random.randint(WIDTH//2, WIDTH)
-            sy = random.randint(50, 200)
-            for i in range(5):
-                pygame.draw.circle(screen, SILVERY_WHITE, (sx - i * 10, sy + i * 5), 2 - i//2)
+        # Twinkling and shooting stars
+        star_count = int(STAR_COUNT * quality.tier["star_fraction"])
+        self.starfield.draw(screen, pygame.time.get_ticks() * 0.001, star_count)
         
         # Mysterious fog at bottom
-        fog_surface = pygame.Surface((WIDTH, 150), pygame.SRCALPHA)
-        for y in range(150):
-            alpha = int((y / 150) * 100)
-            pygame.draw.line(fog_surface, (*DEEP_PURPLE, alpha), (0, y), (WIDTH, y))
-        screen.blit(fog_surface, (0, HEIGHT - 150))
+        if quality.tier["fog"]:
+            screen.blit(self.fog_surface, (0, HEIGHT - 150))
         
         # Castle ground
         pygame.draw.rect(screen, DARK_FOREST, (0, HEIGHT - 120, WIDTH, 120))
@@ -501,7 +1716,7 @@ class Game:
         
     def reset(self):
         self.state = "playing"
-        self.player = Player()
+        self.players = create_players(PLAYERS)
         self.obstacles = []
         self.letters = []
         self.collected_letters = ""
@@ -509,7 +1724,36 @@ class Game:
         self.spawn_timer = 0
         self.letter_index = 0
         
+    def begin_run(self):
+        # Detector and latency stats are global rolling windows; marks let finish_run
+        # average only what was added during this run
+        self.run = {"started_at": time.time(), "start": time.perf_counter(), "level": self.current_level,
+                    "frames": 0, "collisions": 0, "paused": 0.0,
+                    "detector_mark": detector_stats.mark(), "latency_mark": latency.stages["total"].mark()}
+
+    def paused(self, seconds):
+        # Time spent paused on focus loss is not part of the run
+        if self.run is not None:
+            self.run["paused"] += seconds
+
+    def finish_run(self, outcome):
+        # outcome: "complete", "lost" or "quit"
+        run, self.run = self.run, None
+        if run is None or run_store is None:
+            return
+        duration = time.perf_counter() - run.pop("start") - run.pop("paused")
+        detector_ms = detector_stats.mean_since(run.pop("detector_mark"))
+        input_latency_ms = latency.stages["total"].mean_since(run.pop("latency_mark"))
+        run.update(outcome=outcome, score=self.score, duration_s=round(duration, 3),
+                   jumps=sum(player.jumps for player in self.players),
+                   avg_fps=round(run.pop("frames") / max(duration, 1e-6), 2),
+                   detector_ms=round(detector_ms, 3) if detector_ms is not None else None,
+                   input_latency_ms=round(input_latency_ms, 3) if input_latency_ms is not None else None,
+                   control_mode=self.control_mode, players=PLAYERS)
+        run_store.record(run)
+
     def next_level(self):
+        self.finish_run("complete")
         self.current_level += 1
         if self.current_level >= len(LEVELS):
             self.state = "all_complete"
@@ -517,10 +1761,12 @@ class Game:
             self.state = "level_complete"
     
     def go_to_welcome(self):
+        if self.state == "playing":
+            self.finish_run("quit")
         self.state = "welcome"
         self.current_level = 0
         self.target_phrase = LEVELS[0]["phrase"]
-        self.player = Player()
+        self.players = create_players(PLAYERS)
         self.obstacles = []
         self.letters = []
         self.collected_letters = ""
@@ -529,21 +1775,22 @@ class Game:
         self.letter_index = 0
         
     def spawn_obstacle(self):
+        if len(self.obstacles) >= OBSTACLE_LIMIT:
+            return
         level_data = LEVELS[self.current_level]
         speed = level_data["speed"]
         
         if len(obstacle_images) > 0:
+            # Images are already 60x60 from load_obstacle_images; sharing the
+            # surface lets every obstacle reuse the same rotation atlas
             img = random.choice(obstacle_images)
-            img_rect = img.get_rect()
-            scale_ratio = min(60 / img_rect.width, 60 / img_rect.height)
-            img_scaled = pygame.transform.smoothscale(
-                img, (int(img_rect.width * scale_ratio), int(img_rect.height * scale_ratio))
-            )
-            self.obstacles.append(Obstacle(WIDTH, speed, True, img_scaled))
+            self.obstacles.append(Obstacle(WIDTH, speed, True, img))
         else:
             self.obstacles.append(Obstacle(WIDTH, speed, False, None))
         
     def spawn_letter(self):
+        if len(self.letters) >= LETTER_LIMIT:
+            return
         level_data = LEVELS[self.current_level]
         speed = level_data["speed"]
         
@@ -552,471 +1799,743 @@ class Game:
                 self.letters.append(Letter(WIDTH, char, speed))
                 break
     
-    def check_collision(self, obj1_x, obj1_y, obj1_w, obj1_h, obj2_x, obj2_y, obj2_w, obj2_h):
-        return (obj1_x < obj2_x + obj2_w and
-                obj1_x + obj1_w > obj2_x and
-                obj1_y < obj2_y + obj2_h and
-                obj1_y + obj1_h > obj2_y)
-    
-    def update(self):
-        if self.state != "playing":
-            return
+    def best_score(self, level):
+        return run_store.best(level) if run_store else None
+
+    def start_level(self, level_idx):
+        self.current_level = level_idx
+        self.state = "playing"
+        self.players = create_players(PLAYERS)
+        self.obstacles = []
+        self.letters = []
+        self.collected_letters = ""
+        self.score = 0
+        self.spawn_timer = 0
+        self.letter_index = 0
+        self.target_phrase = LEVELS[level_idx]["phrase"]
+        self.begin_run()
+
+# ------------------ Scenes ------------------
+class Scene:
+    # One game state with its own input, update and draw. Layers built through
+    # cached() are freed on exit, so a scene only holds surfaces while it is shown;
+    # enter() can prebuild them so the first frame does not pay for it.
+    name = None
+    gameplay = False  # camera inference, pacing stats and run tracking happen only here
+
+    def __init__(self, game):
+        self.game = game
+        self.layers = {}
+        self.update_stats = FrameStats()
+        self.draw_stats = FrameStats()
+
+    def enter(self):
+        pass
+
+    def exit(self):
+        self.layers.clear()
+
+    def cached(self, key, build):
+        surface = self.layers.get(key)
+        if surface is None:
+            surface = self.layers[key] = build()
+        return surface
+
+    def handle_event(self, event, mouse_pos):
+        # Returns True when the scene used the event
+        return False
+
+    def update(self, mouse_pos):
+        pass
+
+    def draw(self, screen):
+        pass
+
+class WelcomeScene(Scene):
+    name = "welcome"
+
+    def __init__(self, game):
+        super().__init__(game)
+        self.story_button = Button(WIDTH//2 - 120, 480, 240, 55, "THE PROPHECY", DEEP_PURPLE, MYSTIC_PURPLE)
+
+    def enter(self):
+        self.title_layer()
+        self.instructions_layer()
+
+    def title_layer(self):
+        return self.cached("title", lambda: compose((WIDTH, 145), lambda s: self.draw_welcome_title(s, 45)))
+
+    def instructions_layer(self):
+        return self.cached(("instructions", self.game.control_mode),
+                           lambda: compose((WIDTH, 140), lambda s: self.draw_welcome_instructions(s, 20)))
+
+    def handle_event(self, event, mouse_pos):
+        if event.type == pygame.MOUSEBUTTONDOWN and self.story_button.is_clicked(mouse_pos):
+            self.game.state = "story"
+            return True
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+            self.game.start_level(self.game.current_level)
+            return True
+        return False
+
+    def update(self, mouse_pos):
+        self.story_button.check_hover(mouse_pos)
+
+    def draw_welcome_title(self, surface, title_y):
+        # Title glow
+        title_glow = font_title.render("HOGWARTS", True, (*ENCHANTED_GOLD, 100))
+        glow_rect = title_glow.get_rect(center=(WIDTH//2, title_y))
+        for offset in [(2, 2), (-2, 2), (2, -2), (-2, -2)]:
+            surface.blit(title_glow, (glow_rect.x + offset[0], glow_rect.y + offset[1]))
         
-        self.player.update()
-        level_data = LEVELS[self.current_level]
+        title = font_title.render("HOGWARTS", True, ENCHANTED_GOLD)
+        title_rect = title.get_rect(center=(WIDTH//2, title_y))
+        surface.blit(title, title_rect)
+        
+        # Lightning bolts
+        pygame.draw.line(surface, ENCHANTED_GOLD, (title_rect.left - 40, title_y), (title_rect.left - 50, title_y - 10), 3)
+        pygame.draw.line(surface, ENCHANTED_GOLD, (title_rect.left - 50, title_y - 10), (title_rect.left - 45, title_y - 5), 3)
+        pygame.draw.line(surface, ENCHANTED_GOLD, (title_rect.right + 40, title_y), (title_rect.right + 50, title_y - 10), 3)
+        pygame.draw.line(surface, ENCHANTED_GOLD, (title_rect.right + 50, title_y - 10), (title_rect.right + 45, title_y - 5), 3)
+        
+        subtitle = font_large.render("The Forbidden Run", True, MYSTIC_PURPLE)
+        subtitle_rect = subtitle.get_rect(center=(WIDTH//2, title_y + 60))
+        surface.blit(subtitle, subtitle_rect)
+        
+        # Decorative line
+        pygame.draw.line(surface, ENCHANTED_GOLD, (WIDTH//2 - 150, title_y + 95), (WIDTH//2 + 150, title_y + 95), 2)
+
+    def draw_welcome_instructions(self, surface, y_offset):
+        if self.game.control_mode == "keyboard":
+            inst_title = font_medium.render("WAND CONTROLS", True, PHOENIX_ORANGE)
+            instruction1 = font_small.render("ARROW UP or SPACE - Cast Wingardium Leviosa", True, SILVERY_WHITE)
+            instruction2 = font_small.render("Press H to switch to Hand Magic", True, MIST_GRAY)
+        else:
+            inst_title = font_medium.render("HAND MAGIC", True, PHOENIX_ORANGE)
+            instruction1 = font_small.render("Open your hand (4+ fingers) - Levitate!", True, SILVERY_WHITE)
+            instruction2 = font_small.render("Press K to switch to Keyboard", True, MIST_GRAY)
+        
+        inst_rect = inst_title.get_rect(center=(WIDTH//2, y_offset))
+        surface.blit(inst_title, inst_rect)
+        inst1_rect = instruction1.get_rect(center=(WIDTH//2, y_offset + 45))
+        surface.blit(instruction1, inst1_rect)
+        inst2_rect = instruction2.get_rect(center=(WIDTH//2, y_offset + 80))
+        surface.blit(instruction2, inst2_rect)
+        
+        if PLAYERS > 1:
+            if self.game.control_mode == "keyboard":
+                coop = font_tiny.render("Two wizards: P1 uses SPACE/UP, P2 uses W", True, MIST_GRAY)
+            else:
+                coop = font_tiny.render("Two wizards: P1 stands on the left, P2 on the right", True, MIST_GRAY)
+            surface.blit(coop, coop.get_rect(center=(WIDTH//2, y_offset + 110)))
+
+    def draw_welcome_symbols(self, screen):
+        # Floating magical symbols: the spinning star is drawn live, the rest are cached sprites
+        symbols_y = 550
+        ticks = pygame.time.get_ticks()
+        # Star
+        star_x = WIDTH//2 - 200
+        for i in range(5):
+            angle = math.pi * 2 * i / 5 - math.pi / 2 + ticks * 0.002
+            x = star_x + math.cos(angle) * 8
+            y = symbols_y + math.sin(angle) * 8 + math.sin(ticks * 0.002) * 10
+            pygame.draw.circle(screen, ENCHANTED_GOLD, (int(x), int(y)), 3)
+        
+        for phase, (x, sprite) in enumerate(self.cached("symbols", build_symbol_sprites), start=1):
+            y = symbols_y + math.sin(ticks * 0.002 + phase) * 10
+            screen.blit(sprite, sprite.get_rect(center=(x, int(y))))
+
+    def draw(self, screen):
+        # Animated title with glow
+        title_y = 60 + math.sin(pygame.time.get_ticks() * 0.002) * 5
+        screen.blit(self.title_layer(), (0, title_y - 45))
+        
+        # Instructions with icons
+        screen.blit(self.instructions_layer(), (0, 200))
+        
+        # Pulsing start text, quantized so each shade is rendered only once
+        pulse = round((abs(math.sin(pygame.time.get_ticks() * 0.003)) * 0.3 + 0.7) * 50) / 50
+        start_text = self.cached(("start", pulse), lambda: font_large.render(
+            "Press SPACE to Begin", True, tuple(int(c * pulse) for c in EMERALD)))
+        start_rect = start_text.get_rect(center=(WIDTH//2, 390))
+        screen.blit(start_text, start_rect)
+        
+        self.story_button.draw(screen)
+        self.draw_welcome_symbols(screen)
+
+class StoryScene(Scene):
+    name = "story"
+
+    def handle_event(self, event, mouse_pos):
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+            self.game.state = "welcome"
+            return True
+        return False
+
+    def draw_story(self, surface, lit_lines):
+        title = font_title.render("THE PROPHECY", True, ENCHANTED_GOLD)
+        title_rect = title.get_rect(center=(WIDTH//2, 50))
+        surface.blit(title, title_rect)
+        
+        # Decorative scrolls
+        pygame.draw.rect(surface, (210, 180, 140), (WIDTH//2 - 200, 40, 30, 30), border_radius=5)
+        pygame.draw.rect(surface, (210, 180, 140), (WIDTH//2 + 170, 40, 30, 30), border_radius=5)
+        
+        pygame.draw.line(surface, ENCHANTED_GOLD, (WIDTH//2 - 180, 90), (WIDTH//2 + 180, 90), 2)
+        
+        y_pos = 140
+        for i, line in enumerate(STORY_LINES):
+            text = font_small.render(line, True, SILVERY_WHITE if i < lit_lines else MIST_GRAY)
+            text_rect = text.get_rect(center=(WIDTH//2, y_pos))
+            surface.blit(text, text_rect)
+            y_pos += 30
+        
+        back_text = font_small.render("Press SPACE to return", True, ENCHANTED_GOLD)
+        back_rect = back_text.get_rect(center=(WIDTH//2, 540))
+        surface.blit(back_text, back_rect)
+
+    def draw(self, screen):
+        # Lines fade from gray to white shortly after launch
+        ticks = pygame.time.get_ticks()
+        lit_lines = sum(1 for i in range(len(STORY_LINES)) if (ticks - i * 100) // 3 >= 255)
+        story = self.cached(("story", lit_lines), lambda: compose((WIDTH, HEIGHT), lambda s: self.draw_story(s, lit_lines)))
+        screen.blit(story, (0, 0))
+
+class Hud:
+    # The in-game panel as one persistent layer. Only the regions whose values
+    # changed are redrawn, over a copy of the empty panel, so a steady frame costs
+    # one blit for the panel and one for the mode badge in the opposite corner.
+    POS = (10, 10)
+    SCORE_RECT = pygame.Rect(10, 78, 280, 28)
+    PROGRESS_RECT = pygame.Rect(10, 115, 280, 30)  # wide enough for the longest spell text
+    BADGE_POS = (WIDTH - 190, HEIGHT - 40)
+
+    def __init__(self):
+        self.layer = pygame.Surface((300, 200), pygame.SRCALPHA)
+        self.panel = None  # empty panel with the level's static text
+        self.badge = None
+        self.shown = {}  # values currently drawn on the layer
+
+    def build_panel(self, game):
+        level_info = LEVELS[game.current_level]
+        self.panel = pygame.Surface(self.layer.get_size(), pygame.SRCALPHA)
+        # Modern HUD with glass effect
+        pygame.draw.rect(self.panel, (*MIDNIGHT_BLUE, 180), self.panel.get_rect(), border_radius=15)
+        pygame.draw.rect(self.panel, (*ENCHANTED_GOLD, 100), self.panel.get_rect(), 2, border_radius=15)
+        self.panel.blit(font_medium.render(f"{level_info['name']}", True, ENCHANTED_GOLD), (10, 10))
+        self.panel.blit(font_small.render(f"{level_info['description']}", True, MYSTIC_PURPLE), (10, 45))
+        # Spell progress bar track
+        pygame.draw.rect(self.panel, (*SHADOW_BLACK, 150), (10, 115, 260, 30), border_radius=8)
+        self.panel.blit(font_tiny.render(f"Target: {game.target_phrase}", True, MIST_GRAY), (10, 155))
+        self.layer.fill((0, 0, 0, 0))
+        self.layer.blit(self.panel, (0, 0))
+
+    def restore(self, rect):
+        # Blitting onto cleared pixels copies the panel exactly, alpha included
+        self.layer.fill((0, 0, 0, 0), rect)
+        self.layer.blit(self.panel, rect, rect)
+
+    def build_badge(self, control_mode):
+        self.badge = pygame.Surface((180, 30), pygame.SRCALPHA)
+        pygame.draw.rect(self.badge, (*DEEP_PURPLE, 180), self.badge.get_rect(), border_radius=8)
+        mode_icon = "HAND" if control_mode == "hand" else "KEYS"
+        self.badge.blit(font_tiny.render(f"{mode_icon}: {control_mode.upper()}", True, SILVERY_WHITE), (10, 5))
+
+    def draw(self, screen, game):
+        shown = self.shown
+        if shown.get("level") != (game.current_level, game.target_phrase):
+            self.build_panel(game)
+            shown.clear()
+            shown["level"] = (game.current_level, game.target_phrase)
+        if shown.get("score") != game.score:
+            self.restore(self.SCORE_RECT)
+            self.layer.blit(font_small.render(f"House Points: {game.score}", True, SILVERY_WHITE), (10, 80))
+            shown["score"] = game.score
+        if shown.get("collected") != game.collected_letters:
+            self.restore(self.PROGRESS_RECT)
+            progress = len(game.collected_letters) / len(game.target_phrase)
+            if progress > 0:
+                pygame.draw.rect(self.layer, EMERALD, (10, 115, int(260 * progress), 30), border_radius=8)
+            self.layer.blit(font_small.render(f"Spell: {game.collected_letters}", True, ENCHANTED_GOLD), (15, 120))
+            shown["collected"] = game.collected_letters
+        if shown.get("mode") != game.control_mode:
+            self.build_badge(game.control_mode)
+            shown["mode"] = game.control_mode
+        screen.blit(self.layer, self.POS)
+        screen.blit(self.badge, self.BADGE_POS)
+
+class PlayingScene(Scene):
+    name = "playing"
+    gameplay = True
+
+    def __init__(self, game):
+        super().__init__(game)
+        self.home_button = Button(WIDTH - 180, 15, 165, 45, "GREAT HALL", DEEP_PURPLE, MYSTIC_PURPLE)
+        self.hud = None
+
+    def enter(self):
+        self.hud = Hud()
+        gameplay_started()
+
+    def exit(self):
+        super().exit()
+        self.hud = None
+        gameplay_ended()
+
+    def handle_event(self, event, mouse_pos):
+        game = self.game
+        if event.type == pygame.MOUSEBUTTONDOWN and self.home_button.is_clicked(mouse_pos):
+            game.go_to_welcome()
+            return True
+        if event.type != pygame.KEYDOWN:
+            return False
+        if event.key == pygame.K_ESCAPE:
+            game.go_to_welcome()
+            return True
+        if game.control_mode != "keyboard":
+            return False
+        if event.key in (pygame.K_SPACE, pygame.K_UP):
+            game.players[0].jump()
+            return True
+        if event.key == pygame.K_w and PLAYERS > 1:
+            game.players[1].jump()
+            return True
+        return False
+
+    def update(self, mouse_pos):
+        self.home_button.check_hover(mouse_pos)
+        game = self.game
+        for player in game.players:
+            player.update()
+        if game.run is not None:
+            game.run["frames"] += 1
+        level_data = LEVELS[game.current_level]
+        game.starfield.update(level_data["speed"])
         
-        self.spawn_timer += 1
-        if self.spawn_timer % level_data["spawn_rate_obstacle"] == 0:
-            self.spawn_obstacle()
-        if self.spawn_timer % level_data["spawn_rate_letter"] == 0:
-            self.spawn_letter()
+        game.spawn_timer += 1
+        if game.spawn_timer % level_data["spawn_rate_obstacle"] == 0:
+            game.spawn_obstacle()
+        if game.spawn_timer % level_data["spawn_rate_letter"] == 0:
+            game.spawn_letter()
         
-        for obstacle in self.obstacles[:]:
+        ticks = pygame.time.get_ticks()
+        for obstacle in game.obstacles[:]:
             obstacle.update()
             if obstacle.off_screen():
-                self.obstacles.remove(obstacle)
-                self.score += 15
-            elif self.check_collision(
-                self.player.x, self.player.y, self.player.width, self.player.height,
-                obstacle.x, obstacle.y, obstacle.width, obstacle.height
-            ):
-                self.state = "lost"
-                # Explosion particles
-                for _ in range(30):
-                    particles.append(MagicParticle(self.player.x + 25, self.player.y + 35, CRIMSON))
+                game.obstacles.remove(obstacle)
+                game.score += 15
+                continue
+            for player in game.players:
+                if player.alive and entities_collide(player, obstacle, ticks):
+                    # A cursed wizard is out; the run is lost once nobody is left
+                    player.alive = False
+                    if game.run is not None:
+                        game.run["collisions"] += 1
+                    if not any(p.alive for p in game.players):
+                        game.state = "lost"
+                        game.finish_run("lost")
+                    # Explosion particles
+                    for _ in range(30):
+                        spawn_particle(player.x + 25, player.y + 35, CRIMSON)
         
-        for letter in self.letters[:]:
+        for letter in game.letters[:]:
             letter.update()
             if letter.off_screen():
-                self.letters.remove(letter)
-            elif not letter.collected and self.check_collision(
-                self.player.x, self.player.y, self.player.width, self.player.height,
-                letter.x, letter.y, letter.width, letter.height
+                game.letters.remove(letter)
+            elif not letter.collected and any(
+                player.alive and entities_collide(player, letter, ticks)
+                for player in game.players
             ):
-                next_letter_index = len(self.collected_letters)
-                if next_letter_index < len(self.target_phrase):
-                    expected_letter = self.target_phrase[next_letter_index]
+                next_letter_index = len(game.collected_letters)
+                if next_letter_index < len(game.target_phrase):
+                    expected_letter = game.target_phrase[next_letter_index]
                     if letter.char == expected_letter:
                         letter.collected = True
-                        self.collected_letters += letter.char
-                        self.score += 75
-                        self.letters.remove(letter)
+                        game.collected_letters += letter.char
+                        game.score += 75
+                        game.letters.remove(letter)
                         # Collection particles
                         for _ in range(20):
-                            particles.append(MagicParticle(letter.x, letter.y, ENCHANTED_GOLD))
+                            spawn_particle(letter.x, letter.y, ENCHANTED_GOLD)
                         
-                        if self.collected_letters == self.target_phrase:
-                            self.next_level()
-    
+                        if game.collected_letters == game.target_phrase:
+                            game.next_level()
+
     def draw(self, screen):
-        self.draw_magical_background(screen)
+        game = self.game
+        for player in game.players:
+            if player.alive:
+                player.draw(screen)
         
-        # Update and draw particles
-        for particle in particles[:]:
-            particle.update()
-            particle.draw(screen)
-            if particle.life <= 0:
-                particles.remove(particle)
+        for obstacle in game.obstacles:
+            obstacle.draw(screen)
         
-        if self.state == "welcome":
-            # Animated title with glow
-            title_y = 60 + math.sin(pygame.time.get_ticks() * 0.002) * 5
-            
-            # Title glow
-            glow_surf = pygame.Surface((WIDTH, 100), pygame.SRCALPHA)
-            title_glow = font_title.render("HOGWARTS", True, (*ENCHANTED_GOLD, 100))
-            glow_rect = title_glow.get_rect(center=(WIDTH//2, title_y))
-            for offset in [(2, 2), (-2, 2), (2, -2), (-2, -2)]:
-                screen.blit(title_glow, (glow_rect.x + offset[0], glow_rect.y + offset[1]))
-            
-            title = font_title.render("HOGWARTS", True, ENCHANTED_GOLD)
-            title_rect = title.get_rect(center=(WIDTH//2, title_y))
-            screen.blit(title, title_rect)
-            
-            # Lightning bolts
-            pygame.draw.line(screen, ENCHANTED_GOLD, (title_rect.left - 40, title_y), (title_rect.left - 50, title_y - 10), 3)
-            pygame.draw.line(screen, ENCHANTED_GOLD, (title_rect.left - 50, title_y - 10), (title_rect.left - 45, title_y - 5), 3)
-            pygame.draw.line(screen, ENCHANTED_GOLD, (title_rect.right + 40, title_y), (title_rect.right + 50, title_y - 10), 3)
-            pygame.draw.line(screen, ENCHANTED_GOLD, (title_rect.right + 50, title_y - 10), (title_rect.right + 45, title_y - 5), 3)
-            
-            subtitle = font_large.render("The Forbidden Run", True, MYSTIC_PURPLE)
-            subtitle_rect = subtitle.get_rect(center=(WIDTH//2, title_y + 60))
-            screen.blit(subtitle, subtitle_rect)
-            
-            # Decorative line
-            pygame.draw.line(screen, ENCHANTED_GOLD, (WIDTH//2 - 150, title_y + 95), (WIDTH//2 + 150, title_y + 95), 2)
-            
-            # Instructions with icons
-            y_offset = 220
-            if self.control_mode == "keyboard":
-                inst_title = font_medium.render("WAND CONTROLS", True, PHOENIX_ORANGE)
-                instruction1 = font_small.render("ARROW UP or SPACE - Cast Wingardium Leviosa", True, SILVERY_WHITE)
-                instruction2 = font_small.render("Press H to switch to Hand Magic", True, MIST_GRAY)
-            else:
-                inst_title = font_medium.render("HAND MAGIC", True, PHOENIX_ORANGE)
-                instruction1 = font_small.render("Open your hand (4+ fingers) - Levitate!", True, SILVERY_WHITE)
-                instruction2 = font_small.render("Press K to switch to Keyboard", True, MIST_GRAY)
-            
-            inst_rect = inst_title.get_rect(center=(WIDTH//2, y_offset))
-            screen.blit(inst_title, inst_rect)
-            inst1_rect = instruction1.get_rect(center=(WIDTH//2, y_offset + 45))
-            screen.blit(instruction1, inst1_rect)
-            inst2_rect = instruction2.get_rect(center=(WIDTH//2, y_offset + 80))
-            screen.blit(instruction2, inst2_rect)
-            
-            # Pulsing start text
-            pulse = abs(math.sin(pygame.time.get_ticks() * 0.003)) * 0.3 + 0.7
-            start_color = tuple(int(c * pulse) for c in EMERALD)
-            start_text = font_large.render("Press SPACE to Begin", True, start_color)
-            start_rect = start_text.get_rect(center=(WIDTH//2, 390))
-            screen.blit(start_text, start_rect)
-            
-            self.story_button.draw(screen)
-            
-            # Floating magical symbols using shapes
-            symbols_y = 550
-            # Star
-            star_x = WIDTH//2 - 200
-            for i in range(5):
-                angle = math.pi * 2 * i / 5 - math.pi / 2 + pygame.time.get_ticks() * 0.002
-                x = star_x + math.cos(angle) * 8
-                y = symbols_y + math.sin(angle) * 8 + math.sin(pygame.time.get_ticks() * 0.002) * 10
-                pygame.draw.circle(screen, ENCHANTED_GOLD, (int(x), int(y)), 3)
-            
-            # Crystal ball
-            ball_x = WIDTH//2 - 100
-            ball_y = symbols_y + math.sin(pygame.time.get_ticks() * 0.002 + 1) * 10
-            pygame.draw.circle(screen, MYSTIC_PURPLE, (ball_x, int(ball_y)), 10)
-            pygame.draw.circle(screen, SILVERY_WHITE, (ball_x - 3, int(ball_y) - 3), 3)
-            
-            # Scroll
-            scroll_x = WIDTH//2
-            scroll_y = symbols_y + math.sin(pygame.time.get_ticks() * 0.002 + 2) * 10
-            pygame.draw.rect(screen, (210, 180, 140), (scroll_x - 8, int(scroll_y) - 10, 16, 20), border_radius=2)
-            pygame.draw.line(screen, SHADOW_BLACK, (scroll_x - 5, int(scroll_y) - 5), (scroll_x + 5, int(scroll_y) - 5), 1)
-            pygame.draw.line(screen, SHADOW_BLACK, (scroll_x - 5, int(scroll_y)), (scroll_x + 5, int(scroll_y)), 1)
-            pygame.draw.line(screen, SHADOW_BLACK, (scroll_x - 5, int(scroll_y) + 5), (scroll_x + 5, int(scroll_y) + 5), 1)
-            
-            # Owl
-            owl_x = WIDTH//2 + 100
-            owl_y = symbols_y + math.sin(pygame.time.get_ticks() * 0.002 + 3) * 10
-            pygame.draw.circle(screen, (139, 69, 19), (owl_x, int(owl_y)), 10)
-            pygame.draw.circle(screen, SILVERY_WHITE, (owl_x - 4, int(owl_y) - 2), 3)
-            pygame.draw.circle(screen, SILVERY_WHITE, (owl_x + 4, int(owl_y) - 2), 3)
-            pygame.draw.circle(screen, BLACK, (owl_x - 4, int(owl_y) - 2), 2)
-            pygame.draw.circle(screen, BLACK, (owl_x + 4, int(owl_y) - 2), 2)
-            
-            # Wand
-            wand_x = WIDTH//2 + 200
-            wand_y = symbols_y + math.sin(pygame.time.get_ticks() * 0.002 + 4) * 10
-            pygame.draw.line(screen, (101, 67, 33), (wand_x - 10, int(wand_y) - 10), (wand_x + 10, int(wand_y) + 10), 4)
-            pygame.draw.circle(screen, ENCHANTED_GOLD, (wand_x + 10, int(wand_y) + 10), 3)
-            
-        elif self.state == "story":
-            title = font_title.render("THE PROPHECY", True, ENCHANTED_GOLD)
-            title_rect = title.get_rect(center=(WIDTH//2, 50))
-            screen.blit(title, title_rect)
-            
-            # Decorative scrolls
-            pygame.draw.rect(screen, (210, 180, 140), (WIDTH//2 - 200, 40, 30, 30), border_radius=5)
-            pygame.draw.rect(screen, (210, 180, 140), (WIDTH//2 + 170, 40, 30, 30), border_radius=5)
-            
-            pygame.draw.line(screen, ENCHANTED_GOLD, (WIDTH//2 - 180, 90), (WIDTH//2 + 180, 90), 2)
-            
-            story_lines = [
-                "In the depths of the Forbidden Forest,",
-                "dark curses have been unleashed...",
-                "",
-                "As a young wizard at Hogwarts,",
-                "you must master powerful spells",
-                "to survive the enchanted trials.",
-                "",
-                "Collect magical letters to complete",
-                "ancient incantations while dodging",
-                "the cursed obstacles in your path.",
-                "",
-                "Only the bravest can master",
-                "the art of spell-casting!",
-                "",
-                "Will you rise to the challenge?"
-            ]
-            
-            y_pos = 140
-            for i, line in enumerate(story_lines):
-                alpha = min(255, (pygame.time.get_ticks() - i * 100) // 3)
-                color = (*SILVERY_WHITE[:3], min(alpha, 255))
-                text = font_small.render(line, True, SILVERY_WHITE if alpha >= 255 else MIST_GRAY)
-                text_rect = text.get_rect(center=(WIDTH//2, y_pos))
-                screen.blit(text, text_rect)
-                y_pos += 30
-            
-            back_text = font_small.render("Press SPACE to return", True, ENCHANTED_GOLD)
-            back_rect = back_text.get_rect(center=(WIDTH//2, 540))
-            screen.blit(back_text, back_rect)
-            
-        elif self.state == "playing":
-            self.player.draw(screen)
-            
-            for obstacle in self.obstacles:
-                obstacle.draw(screen)
-            
-            for letter in self.letters:
-                letter.draw(screen)
-            
-            # Modern HUD with glass effect
-            hud_surface = pygame.Surface((300, 200), pygame.SRCALPHA)
-            pygame.draw.rect(hud_surface, (*MIDNIGHT_BLUE, 180), hud_surface.get_rect(), border_radius=15)
-            pygame.draw.rect(hud_surface, (*ENCHANTED_GOLD, 100), hud_surface.get_rect(), 2, border_radius=15)
-            screen.blit(hud_surface, (10, 10))
-            
-            level_info = LEVELS[self.current_level]
-            level_text = font_medium.render(f"{level_info['name']}", True, ENCHANTED_GOLD)
-            screen.blit(level_text, (20, 20))
-            
-            desc_text = font_small.render(f"{level_info['description']}", True, MYSTIC_PURPLE)
-            screen.blit(desc_text, (20, 55))
-            
-            score_text = font_small.render(f"House Points: {self.score}", True, SILVERY_WHITE)
-            screen.blit(score_text, (20, 90))
-            
-            # Spell progress bar
-            progress_bg = pygame.Surface((260, 30), pygame.SRCALPHA)
-            pygame.draw.rect(progress_bg, (*SHADOW_BLACK, 150), progress_bg.get_rect(), border_radius=8)
-            screen.blit(progress_bg, (20, 125))
-            
-            progress = len(self.collected_letters) / len(self.target_phrase)
-            if progress > 0:
-                progress_width = int(260 * progress)
-                pygame.draw.rect(screen, EMERALD, (20, 125, progress_width, 30), border_radius=8)
-            
-            collected_text = font_small.render(f"Spell: {self.collected_letters}", True, ENCHANTED_GOLD)
-            screen.blit(collected_text, (25, 130))
-            
-            target_text = font_tiny.render(f"Target: {self.target_phrase}", True, MIST_GRAY)
-            screen.blit(target_text, (20, 165))
-            
-            # Mode indicator
-            mode_bg = pygame.Surface((180, 30), pygame.SRCALPHA)
-            pygame.draw.rect(mode_bg, (*DEEP_PURPLE, 180), mode_bg.get_rect(), border_radius=8)
-            screen.blit(mode_bg, (WIDTH - 190, HEIGHT - 40))
-            
-            mode_icon = "HAND" if self.control_mode == "hand" else "KEYS"
-            mode_text = font_tiny.render(f"{mode_icon}: {self.control_mode.upper()}", True, SILVERY_WHITE)
-            screen.blit(mode_text, (WIDTH - 180, HEIGHT - 35))
-            
-            self.home_button.draw(screen)
-            
-        elif self.state == "level_complete":
-            # Victory animation
-            victory_y = 120 + math.sin(pygame.time.get_ticks() * 0.003) * 10
-            
-            congrats = font_title.render("SPELL MASTERED!", True, ENCHANTED_GOLD)
-            congrats_rect = congrats.get_rect(center=(WIDTH//2, victory_y))
-            
-            # Glow effect
-            for offset in [(3, 3), (-3, 3), (3, -3), (-3, -3)]:
-                glow = font_title.render("SPELL MASTERED!", True, (*ENCHANTED_GOLD, 80))
-                screen.blit(glow, (congrats_rect.x + offset[0], congrats_rect.y + offset[1]))
-            
-            screen.blit(congrats, congrats_rect)
-            
-            # Lightning bolts
-            pygame.draw.line(screen, ENCHANTED_GOLD, (congrats_rect.left - 40, victory_y), (congrats_rect.left - 50, victory_y - 15), 4)
-            pygame.draw.line(screen, ENCHANTED_GOLD, (congrats_rect.right + 40, victory_y), (congrats_rect.right + 50, victory_y - 15), 4)
-            
-            level_info = LEVELS[self.current_level - 1]
-            phrase_text = font_large.render(f"{level_info['description']}", True, MYSTIC_PURPLE)
-            phrase_rect = phrase_text.get_rect(center=(WIDTH//2, victory_y + 80))
-            screen.blit(phrase_text, phrase_rect)
-            
-            spell_display = font_medium.render(f'"{level_info["phrase"]}"', True, EMERALD)
-            spell_rect = spell_display.get_rect(center=(WIDTH//2, victory_y + 130))
-            screen.blit(spell_display, spell_rect)
-            
-            score_text = font_large.render(f"* {self.score} House Points", True, SILVERY_WHITE)
-            score_rect = score_text.get_rect(center=(WIDTH//2, victory_y + 190))
-            screen.blit(score_text, score_rect)
-            
-            next_text = font_medium.render("Press SPACE for Next Challenge", True, ENCHANTED_GOLD)
-            next_rect = next_text.get_rect(center=(WIDTH//2, victory_y + 270))
-            screen.blit(next_text, next_rect)
-            
-            # Victory particles
-            if random.random() > 0.7:
-                particles.append(MagicParticle(random.randint(100, WIDTH-100), 
-                                              random.randint(50, 400), 
-                                              random.choice([ENCHANTED_GOLD, EMERALD, MYSTIC_PURPLE])))
-            
-        elif self.state == "all_complete":
-            # Grand finale
-            finale_y = 80 + math.sin(pygame.time.get_ticks() * 0.002) * 8
-            
-            win_text = font_title.render("GRAND WIZARD", True, ENCHANTED_GOLD)
-            win_rect = win_text.get_rect(center=(WIDTH//2, finale_y))
-            
-            # Epic glow
-            for i in range(3):
-                offset = (i + 1) * 4
-                glow = font_title.render("GRAND WIZARD", True, (*ENCHANTED_GOLD, 40))
-                screen.blit(glow, (win_rect.x + offset, win_rect.y + offset))
-            
-            screen.blit(win_text, win_rect)
-            
-            # Trophy symbol
-            trophy_x = WIDTH // 2
-            trophy_y = finale_y - 30
-            pygame.draw.rect(screen, ENCHANTED_GOLD, (trophy_x - 20, trophy_y, 40, 25), border_radius=5)
-            pygame.draw.rect(screen, ENCHANTED_GOLD, (trophy_x - 5, trophy_y + 25, 10, 10))
-            pygame.draw.ellipse(screen, ENCHANTED_GOLD, (trophy_x - 25, trophy_y + 35, 50, 10))
-            
-            congrats = font_large.render("You've Mastered All Spells!", True, MYSTIC_PURPLE)
-            congrats_rect = congrats.get_rect(center=(WIDTH//2, finale_y + 80))
-            screen.blit(congrats, congrats_rect)
-            
-            motto = font_medium.render("The wizarding world salutes you!", True, EMERALD)
-            motto_rect = motto.get_rect(center=(WIDTH//2, finale_y + 130))
-            screen.blit(motto, motto_rect)
-            
-            score_text = font_large.render(f"* Total: {self.score} House Points", True, ENCHANTED_GOLD)
-            score_rect = score_text.get_rect(center=(WIDTH//2, finale_y + 200))
-            screen.blit(score_text, score_rect)
-            
-            # Achievements
-            achievements = [
-                "* Lumos Master",
-                "* Dueling Champion", 
-                "* Patronus Summoner"
-            ]
-            y = finale_y + 260
-            for achievement in achievements:
-                ach_text = font_small.render(achievement, True, SILVERY_WHITE)
-                ach_rect = ach_text.get_rect(center=(WIDTH//2, y))
-                screen.blit(ach_text, ach_rect)
-                y += 35
-            
-            replay_text = font_medium.render("Press SPACE to Train Again", True, PHOENIX_ORANGE)
-            replay_rect = replay_text.get_rect(center=(WIDTH//2, finale_y + 410))
-            screen.blit(replay_text, replay_rect)
-            
-            # Celebration particles
-            if random.random() > 0.5:
-                particles.append(MagicParticle(random.randint(0, WIDTH), 
-                                              random.randint(0, 300),
-                                              random.choice([ENCHANTED_GOLD, EMERALD, MYSTIC_PURPLE, PHOENIX_ORANGE])))
-            
-        elif self.state == "lost":
-            defeat_y = 120 + math.sin(pygame.time.get_ticks() * 0.004) * 5
-            
-            lost_text = font_title.render("CURSE HIT!", True, CRIMSON)
-            lost_rect = lost_text.get_rect(center=(WIDTH//2, defeat_y))
-            
-            # Dark glow
-            for offset in [(3, 3), (-3, 3), (3, -3), (-3, -3)]:
-                glow = font_title.render("CURSE HIT!", True, (*DEEP_PURPLE, 100))
-                screen.blit(glow, (lost_rect.x + offset[0], lost_rect.y + offset[1]))
-            
-            screen.blit(lost_text, lost_rect)
-            
-            # Skull symbol
-            skull_x = WIDTH // 2
-            skull_y = defeat_y - 30
-            pygame.draw.circle(screen, CRIMSON, (skull_x, skull_y), 15)
-            pygame.draw.ellipse(screen, SHADOW_BLACK, (skull_x - 6, skull_y - 3, 5, 7))
-            pygame.draw.ellipse(screen, SHADOW_BLACK, (skull_x + 1, skull_y - 3, 5, 7))
-            
-            encourage = font_large.render("Even great wizards fail sometimes...", True, SILVERY_WHITE)
-            encourage_rect = encourage.get_rect(center=(WIDTH//2, defeat_y + 80))
-            screen.blit(encourage, encourage_rect)
-            
-            tip = font_medium.render("Tip: Perfect your timing!", True, PHOENIX_ORANGE)
-            tip_rect = tip.get_rect(center=(WIDTH//2, defeat_y + 140))
-            screen.blit(tip, tip_rect)
-            
-            score_text = font_large.render(f"* House Points: {self.score}", True, ENCHANTED_GOLD)
-            score_rect = score_text.get_rect(center=(WIDTH//2, defeat_y + 210))
-            screen.blit(score_text, score_rect)
-            
-            replay_text = font_medium.render("Press SPACE to Try Again", True, EMERALD)
-            replay_rect = replay_text.get_rect(center=(WIDTH//2, defeat_y + 290))
-            screen.blit(replay_text, replay_rect)
+        for letter in game.letters:
+            letter.draw(screen)
+        
+        self.hud.draw(screen, game)
+        
+        self.home_button.draw(screen)
 
-    def start_level(self, level_idx):
-        self.current_level = level_idx
-        self.state = "playing"
-        self.player = Player()
-        self.obstacles = []
-        self.letters = []
-        self.collected_letters = ""
-        self.score = 0
-        self.spawn_timer = 0
-        self.letter_index = 0
-        self.target_phrase = LEVELS[level_idx]["phrase"]
+class LevelCompleteScene(Scene):
+    name = "level_complete"
+
+    def enter(self):
+        self.victory_layer()
+
+    def victory_layer(self):
+        # The leaderboard is refreshed by the writer thread, so its best is part of the key
+        return self.cached(("level_complete", self.game.current_level, self.game.score,
+                            self.game.best_score(self.game.current_level - 1)),
+                           lambda: compose((WIDTH, 340), lambda s: self.draw_level_complete(s, 40)))
+
+    def handle_event(self, event, mouse_pos):
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+            self.game.start_level(self.game.current_level)
+            return True
+        return False
+
+    def draw_level_complete(self, surface, victory_y):
+        congrats = font_title.render("SPELL MASTERED!", True, ENCHANTED_GOLD)
+        congrats_rect = congrats.get_rect(center=(WIDTH//2, victory_y))
+        
+        # Glow effect
+        glow = font_title.render("SPELL MASTERED!", True, (*ENCHANTED_GOLD, 80))
+        for offset in [(3, 3), (-3, 3), (3, -3), (-3, -3)]:
+            surface.blit(glow, (congrats_rect.x + offset[0], congrats_rect.y + offset[1]))
+        
+        surface.blit(congrats, congrats_rect)
+        
+        # Lightning bolts
+        pygame.draw.line(surface, ENCHANTED_GOLD, (congrats_rect.left - 40, victory_y), (congrats_rect.left - 50, victory_y - 15), 4)
+        pygame.draw.line(surface, ENCHANTED_GOLD, (congrats_rect.right + 40, victory_y), (congrats_rect.right + 50, victory_y - 15), 4)
+        
+        level_info = LEVELS[self.game.current_level - 1]
+        phrase_text = font_large.render(f"{level_info['description']}", True, MYSTIC_PURPLE)
+        phrase_rect = phrase_text.get_rect(center=(WIDTH//2, victory_y + 80))
+        surface.blit(phrase_text, phrase_rect)
+        
+        spell_display = font_medium.render(f'"{level_info["phrase"]}"', True, EMERALD)
+        spell_rect = spell_display.get_rect(center=(WIDTH//2, victory_y + 130))
+        surface.blit(spell_display, spell_rect)
+        
+        score_text = font_large.render(f"* {self.game.score} House Points", True, SILVERY_WHITE)
+        score_rect = score_text.get_rect(center=(WIDTH//2, victory_y + 190))
+        surface.blit(score_text, score_rect)
+        
+        best = self.game.best_score(self.game.current_level - 1)
+        if best is not None:
+            best_text = font_small.render(f"Best for this spell: {best} House Points", True, MIST_GRAY)
+            surface.blit(best_text, best_text.get_rect(center=(WIDTH//2, victory_y + 232)))
+        
+        next_text = font_medium.render("Press SPACE for Next Challenge", True, ENCHANTED_GOLD)
+        next_rect = next_text.get_rect(center=(WIDTH//2, victory_y + 270))
+        surface.blit(next_text, next_rect)
+
+    def draw(self, screen):
+        # Victory animation
+        victory_y = 120 + math.sin(pygame.time.get_ticks() * 0.003) * 10
+        screen.blit(self.victory_layer(), (0, victory_y - 40))
+        
+        # Victory particles
+        if random.random() > 0.7:
+            spawn_particle(random.randint(100, WIDTH-100),
+                           random.randint(50, 400),
+                           random.choice([ENCHANTED_GOLD, EMERALD, MYSTIC_PURPLE]))
+
+class AllCompleteScene(Scene):
+    name = "all_complete"
+
+    def enter(self):
+        self.finale_layer()
+
+    def finale_layer(self):
+        return self.cached(("all_complete", self.game.score),
+                           lambda: compose((WIDTH, 470), lambda s: self.draw_all_complete(s, 40)))
+
+    def handle_event(self, event, mouse_pos):
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+            self.game.start_level(0)
+            return True
+        return False
+
+    def draw_all_complete(self, surface, finale_y):
+        win_text = font_title.render("GRAND WIZARD", True, ENCHANTED_GOLD)
+        win_rect = win_text.get_rect(center=(WIDTH//2, finale_y))
+        
+        # Epic glow
+        glow = font_title.render("GRAND WIZARD", True, (*ENCHANTED_GOLD, 40))
+        for i in range(3):
+            offset = (i + 1) * 4
+            surface.blit(glow, (win_rect.x + offset, win_rect.y + offset))
+        
+        surface.blit(win_text, win_rect)
+        
+        # Trophy symbol
+        trophy_x = WIDTH // 2
+        trophy_y = finale_y - 30
+        pygame.draw.rect(surface, ENCHANTED_GOLD, (trophy_x - 20, trophy_y, 40, 25), border_radius=5)
+        pygame.draw.rect(surface, ENCHANTED_GOLD, (trophy_x - 5, trophy_y + 25, 10, 10))
+        pygame.draw.ellipse(surface, ENCHANTED_GOLD, (trophy_x - 25, trophy_y + 35, 50, 10))
+        
+        congrats = font_large.render("You've Mastered All Spells!", True, MYSTIC_PURPLE)
+        congrats_rect = congrats.get_rect(center=(WIDTH//2, finale_y + 80))
+        surface.blit(congrats, congrats_rect)
+        
+        motto = font_medium.render("The wizarding world salutes you!", True, EMERALD)
+        motto_rect = motto.get_rect(center=(WIDTH//2, finale_y + 130))
+        surface.blit(motto, motto_rect)
+        
+        score_text = font_large.render(f"* Total: {self.game.score} House Points", True, ENCHANTED_GOLD)
+        score_rect = score_text.get_rect(center=(WIDTH//2, finale_y + 200))
+        surface.blit(score_text, score_rect)
+        
+        # Achievements
+        achievements = [
+            "* Lumos Master",
+            "* Dueling Champion", 
+            "* Patronus Summoner"
+        ]
+        y = finale_y + 260
+        for achievement in achievements:
+            ach_text = font_small.render(achievement, True, SILVERY_WHITE)
+            ach_rect = ach_text.get_rect(center=(WIDTH//2, y))
+            surface.blit(ach_text, ach_rect)
+            y += 35
+        
+        replay_text = font_medium.render("Press SPACE to Train Again", True, PHOENIX_ORANGE)
+        replay_rect = replay_text.get_rect(center=(WIDTH//2, finale_y + 410))
+        surface.blit(replay_text, replay_rect)
+
+    def draw(self, screen):
+        # Grand finale
+        finale_y = 80 + math.sin(pygame.time.get_ticks() * 0.002) * 8
+        screen.blit(self.finale_layer(), (0, finale_y - 40))
+        
+        # Celebration particles
+        if random.random() > 0.5:
+            spawn_particle(random.randint(0, WIDTH),
+                           random.randint(0, 300),
+                           random.choice([ENCHANTED_GOLD, EMERALD, MYSTIC_PURPLE, PHOENIX_ORANGE]))
+
+class LostScene(Scene):
+    name = "lost"
+
+    def enter(self):
+        self.defeat_layer()
+
+    def defeat_layer(self):
+        return self.cached(("lost", self.game.score, self.game.best_score(self.game.current_level)),
+                           lambda: compose((WIDTH, 360), lambda s: self.draw_lost(s, 50)))
+
+    def handle_event(self, event, mouse_pos):
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+            self.game.start_level(0)
+            return True
+        return False
+
+    def draw_lost(self, surface, defeat_y):
+        lost_text = font_title.render("CURSE HIT!", True, CRIMSON)
+        lost_rect = lost_text.get_rect(center=(WIDTH//2, defeat_y))
+        
+        # Dark glow
+        glow = font_title.render("CURSE HIT!", True, (*DEEP_PURPLE, 100))
+        for offset in [(3, 3), (-3, 3), (3, -3), (-3, -3)]:
+            surface.blit(glow, (lost_rect.x + offset[0], lost_rect.y + offset[1]))
+        
+        surface.blit(lost_text, lost_rect)
+        
+        # Skull symbol
+        skull_x = WIDTH // 2
+        skull_y = defeat_y - 30
+        pygame.draw.circle(surface, CRIMSON, (skull_x, skull_y), 15)
+        pygame.draw.ellipse(surface, SHADOW_BLACK, (skull_x - 6, skull_y - 3, 5, 7))
+        pygame.draw.ellipse(surface, SHADOW_BLACK, (skull_x + 1, skull_y - 3, 5, 7))
+        
+        encourage = font_large.render("Even great wizards fail sometimes...", True, SILVERY_WHITE)
+        encourage_rect = encourage.get_rect(center=(WIDTH//2, defeat_y + 80))
+        surface.blit(encourage, encourage_rect)
+        
+        tip = font_medium.render("Tip: Perfect your timing!", True, PHOENIX_ORANGE)
+        tip_rect = tip.get_rect(center=(WIDTH//2, defeat_y + 140))
+        surface.blit(tip, tip_rect)
+        
+        score_text = font_large.render(f"* House Points: {self.game.score}", True, ENCHANTED_GOLD)
+        score_rect = score_text.get_rect(center=(WIDTH//2, defeat_y + 210))
+        surface.blit(score_text, score_rect)
+        
+        best = self.game.best_score(self.game.current_level)
+        if best is not None:
+            best_text = font_small.render(f"Best for this spell: {best} House Points", True, MIST_GRAY)
+            surface.blit(best_text, best_text.get_rect(center=(WIDTH//2, defeat_y + 252)))
+        
+        replay_text = font_medium.render("Press SPACE to Try Again", True, EMERALD)
+        replay_rect = replay_text.get_rect(center=(WIDTH//2, defeat_y + 290))
+        surface.blit(replay_text, replay_rect)
+
+    def draw(self, screen):
+        defeat_y = 120 + math.sin(pygame.time.get_ticks() * 0.004) * 5
+        screen.blit(self.defeat_layer(), (0, defeat_y - 50))
+
+SCENES = {scene.name: scene for scene in (WelcomeScene, StoryScene, PlayingScene,
+                                          LevelCompleteScene, AllCompleteScene, LostScene)}
 
 # ------------------ Main Game Loop ------------------
+def wait_for_events(timeout_ms):
+    # Sleep until an event arrives or the timeout expires, then drain the queue
+    event = pygame.event.wait(max(1, int(timeout_ms)))
+    if event.type == pygame.NOEVENT:
+        return []
+    return [event] + pygame.event.get()
+
+# Events that wake a menu before its next redraw; anything else (mouse motion,
+# releases, window chatter) waits for the frame, so menus stay at MENU_FPS
+MENU_WAKE_EVENTS = (pygame.QUIT, pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN,
+                    pygame.WINDOWFOCUSLOST, pygame.WINDOWFOCUSGAINED)
+
+def wait_for_menu_events(redraw_ticks):
+    events = []
+    while pygame.time.get_ticks() < redraw_ticks:
+        events += wait_for_events(redraw_ticks - pygame.time.get_ticks())
+        if any(event.type in MENU_WAKE_EVENTS for event in events):
+            break
+    return events + pygame.event.get()
+
 game = Game()
+if BENCHMARK_SCENE in SCENES:
+    if SCENES[BENCHMARK_SCENE].gameplay:
+        game.start_level(game.current_level)
+    else:
+        game.state = BENCHMARK_SCENE
+elif BENCHMARK_SCENE:
+    print(f"🔮 Unknown scene {BENCHMARK_SCENE!r}; scenes: {', '.join(SCENES)}")
+pacer = FramePacer(clock, TARGET_FPS, PACING, display.vsync, SPIN_MS)
+paused_since = None
+if GC_MODE in ("tuned", "levels"):
+    # Everything allocated so far lives until exit; keep it out of every collection
+    gc.collect()
+    gc.freeze()
+if GC_MODE == "tuned":
+    # Fewer, equally cheap young collections instead of one every 700 allocations
+    gc.set_threshold(GC_THRESHOLD, 50, 100)
+elif GC_MODE not in ("default", "levels"):
+    print(f"🔮 Unknown GC mode {GC_MODE!r}; modes: default, tuned, levels")
+if memory_probe is not None:
+    memory_probe.reset()
+window_focused = True
+last_frame_ticks = 0
 while running:
-    mouse_pos = pygame.mouse.get_pos()
+    paused = PAUSE_ON_FOCUS_LOSS and not window_focused
+    detector_idle = not game.scene.gameplay or paused
+    if paused:
+        events = wait_for_events(500)
+    elif not game.scene.gameplay:
+        # Menus only need to wake up for input or the next animation tick
+        events = wait_for_menu_events(last_frame_ticks + 1000 / MENU_FPS)
+    else:
+        # p95 of frame cost so input and jump flags are sampled just in time for the present
+        pacer.before_frame(frame_stats.percentile(95))
+        events = pygame.event.get()
+    
+    frame_start = time.perf_counter()
+    mouse_pos = display.mouse_pos()
     
-    for event in pygame.event.get():
+    for event in events:
         if event.type == pygame.QUIT:
             running = False
-            
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            if game.state == "welcome":
-                if game.story_button.is_clicked(mouse_pos):
-                    game.state = "story"
-            if game.state == "playing":
-                if game.home_button.is_clicked(mouse_pos):
-                    game.go_to_welcome()
+        
+        if event.type == pygame.WINDOWFOCUSLOST:
+            window_focused = False
+        if event.type == pygame.WINDOWFOCUSGAINED:
+            window_focused = True
+            
+        # The current scene gets clicks and keys first; the rest are global
+        if event.type in (pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN) and game.handle_event(event, mouse_pos):
+            continue
                 
         if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_SPACE:
-                if game.state == "welcome":
-                    game.start_level(game.current_level)
-                    game.target_phrase = LEVELS[game.current_level]["phrase"]
-                elif game.state == "story":
-                    game.state = "welcome"
-                elif game.state == "level_complete":
-                    game.start_level(game.current_level)
-                    game.target_phrase = LEVELS[game.current_level]["phrase"]
-                elif game.state in ["all_complete", "lost"]:
-                    game.current_level = 0
-                    game.start_level(game.current_level)
-                    game.target_phrase = LEVELS[game.current_level]["phrase"]
-                elif game.state == "playing" and game.control_mode == "keyboard":
-                    game.player.jump()
-                    
-            if event.key == pygame.K_UP and game.state == "playing" and game.control_mode == "keyboard":
-                game.player.jump()
             if event.key == pygame.K_ESCAPE:
-                if game.state == "playing":
-                    game.go_to_welcome()
-                else:
-                    running = False
+                running = False
             if event.key == pygame.K_h:
                 game.control_mode = "hand"
                 hand_control_enabled = True
             if event.key == pygame.K_k:
                 game.control_mode = "keyboard"
                 hand_control_enabled = False
+            if event.key == pygame.K_l:
+                latency_overlay = not latency_overlay
+            if event.key == pygame.K_d and not game.scene.gameplay:
+                # Cycle gesture backends; the detector thread swaps them
+                names = detector_names()
+                detector_request = names[(names.index(detector_request) + 1) % len(names)] if detector_request in names else names[0]
+    
+    if PAUSE_ON_FOCUS_LOSS and not window_focused:
+        # Paused: no simulation and no drawing, the last frame stays on screen
+        if paused_since is None:
+            paused_since = time.perf_counter()
+        clock.tick()
+        pacer.reset()
+        continue
+    if paused_since is not None:
+        game.paused(time.perf_counter() - paused_since)
+        paused_since = None
     
-    if game.state == "welcome":
-        game.story_button.check_hover(mouse_pos)
-    elif game.state == "playing":
-        game.home_button.check_hover(mouse_pos)
-
     if game.control_mode == "hand":
         with jump_lock:
-            if jump_triggered:
-                game.player.jump()
-                jump_triggered = False
+            for player_idx, player in enumerate(game.players):
+                if jump_triggered[player_idx]:
+                    latency.consume(player_idx, player.jump())
+                    jump_triggered[player_idx] = False
     
-    game.update()
+    game.update(mouse_pos)
     game.draw(screen)
-    pygame.display.flip()
-    clock.tick(60)
+    if latency_overlay:
+        latency.draw(screen)
+    frame_ms = (time.perf_counter() - frame_start) * 1000
+    pacer.before_present()
+    present_start = time.perf_counter()
+    display.present()
+    latency.flipped()
+    if not display.vsync:
+        # A vsync swap blocks until the refresh, which is not frame cost
+        frame_ms += (time.perf_counter() - present_start) * 1000
+    pacer.presented(record=game.scene.gameplay)
+    last_frame_ticks = pygame.time.get_ticks()
+    frame_stats.add(frame_ms)
+    quality.record(frame_ms)
+    if memory_probe is not None:
+        memory_probe.end_frame({"particles": len(particles), "obstacles": len(game.obstacles),
+                                "letters": len(game.letters), "particle sprites": len(particle_sprites)},
+                               game.scene.gameplay)
+    if BENCHMARK_FRAMES and frame_stats.frames >= BENCHMARK_FRAMES:
+        running = False
+
+if BENCHMARK_FRAMES:
+    print(f"⏱️ {display.mode} @ {display.output_size()}: {frame_stats.summary()}")
+    if pacer.intervals.frame_times:
+        print(f"⏱️ pacing ({pacer.mode}): {pacer.summary()}")
+    if detector_stats.frame_times:
+        print(f"⏱️ detector CPU: {detector_stats.summary()}")
+    for scene in game.scenes.values():
+        if scene.draw_stats.frame_times:
+            print(f"⏱️ scene {scene.name}: update mean {scene.update_stats.mean():.2f} ms, "
+                  f"draw {scene.draw_stats.summary()}")
+if memory_probe is not None:
+    print(f"🧠 {memory_probe.summary()}")
+
+if game.state == "playing":
+    if paused_since is not None:
+        game.paused(time.perf_counter() - paused_since)
+    game.finish_run("quit")
+if run_store is not None:
+    run_store.close()
+if LATENCY_DUMP:
+    latency.dump(LATENCY_DUMP)
+if metrics_server is not None:
+    metrics_server.shutdown()
 
 if webcam_available:
     cap.release()
-    hands.close()
+    if detector is not None:
+        detector.close()
 pygame.quit()
\ No newline at end of file